@@ -0,0 +1,121 @@
+"""
+Encode and decode times of the available JSON codecs on typical LSP payloads.
+
+Run from the repository root:
+
+    python -m benchmarks.codec
+"""
+import time
+
+from plugin.core.codec import JsonCodec, CODECS, load_codec
+
+
+def completion_response(items: int) -> dict:
+    return {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "result": {
+            "isIncomplete": False,
+            "items": [{
+                "label": "completion_item_{}".format(i),
+                "kind": 3,
+                "detail": "def completion_item_{}(arg1: int, arg2: str) -> None".format(i),
+                "documentation": {
+                    "kind": "markdown",
+                    "value": "Does thing number {}.\n\n```python\nx = 1\n```".format(i)
+                },
+                "sortText": "{:08}".format(i),
+                "textEdit": {
+                    "range": {"start": {"line": 10, "character": 4}, "end": {"line": 10, "character": 8}},
+                    "newText": "completion_item_{}".format(i)
+                }
+            } for i in range(0, items)]
+        }
+    }
+
+
+def symbols_response(symbols: int) -> dict:
+    return {
+        "jsonrpc": "2.0",
+        "id": 2,
+        "result": [{
+            "name": "symbol_{}".format(i),
+            "kind": 12,
+            "location": {
+                "uri": "file:///home/user/project/src/module_{}.py".format(i % 50),
+                "range": {"start": {"line": i, "character": 0}, "end": {"line": i + 5, "character": 1}}
+            },
+            "containerName": "Container{}".format(i % 10)
+        } for i in range(0, symbols)]
+    }
+
+
+def diagnostics_notification(diagnostics: int) -> dict:
+    return {
+        "jsonrpc": "2.0",
+        "method": "textDocument/publishDiagnostics",
+        "params": {
+            "uri": "file:///home/user/project/src/module.py",
+            "diagnostics": [{
+                "range": {"start": {"line": i, "character": 4}, "end": {"line": i, "character": 20}},
+                "severity": 1 + i % 4,
+                "code": "E{}".format(100 + i % 50),
+                "source": "linter",
+                "message": "undefined name 'variable_{}'".format(i)
+            } for i in range(0, diagnostics)]
+        }
+    }
+
+
+def did_change_notification(lines: int) -> dict:
+    text = "".join("    value_{} = compute(value_{}, 'é中')  # line {}\n".format(i, i - 1, i) for i in range(0, lines))
+    return {
+        "jsonrpc": "2.0",
+        "method": "textDocument/didChange",
+        "params": {
+            "textDocument": {"uri": "file:///home/user/project/src/module.py", "version": 12},
+            "contentChanges": [{"text": text}]
+        }
+    }
+
+
+PAYLOADS = [
+    ("completion, 5000 items", completion_response(5000)),
+    ("workspace symbols, 20000", symbols_response(20000)),
+    ("diagnostics, 2000", diagnostics_notification(2000)),
+    ("didChange, 20000 lines", did_change_notification(20000)),
+]
+
+
+def best_of(repeat: int, function, argument) -> float:
+    best = float("inf")
+    for _ in range(0, repeat):
+        start = time.perf_counter()
+        function(argument)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    codecs = [JsonCodec()]
+    for name, _ in CODECS:
+        codec = load_codec((name,))
+        if codec.name == name:
+            codecs.append(codec)
+        else:
+            print("{} is not installed".format(name))
+
+    for label, payload in PAYLOADS:
+        message = JsonCodec().encode(payload).decode("UTF-8")
+        print("{} ({:.1f} MB)".format(label, len(message) / 1e6))
+        baseline = None
+        for codec in codecs:
+            encode = best_of(5, codec.encode, payload)
+            decode = best_of(5, codec.decode, message)
+            baseline = baseline or (encode, decode)
+            print("  {:>6}: encode {:>7.2f} ms ({:>4.1f}x), decode {:>7.2f} ms ({:>4.1f}x)".format(
+                codec.name, encode * 1000, baseline[0] / encode, decode * 1000, baseline[1] / decode))
+
+
+if __name__ == "__main__":
+    main()
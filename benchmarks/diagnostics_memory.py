@@ -0,0 +1,73 @@
+"""
+Memory kept per diagnostic, for diagnostics as they were stored before slotting (objects with
+instance dicts that keep their LSP dict) and as they are stored now.
+
+Run from the repository root:
+
+    python -m benchmarks.diagnostics_memory
+"""
+import json
+import tracemalloc
+
+from plugin.core.protocol import Diagnostic
+
+
+class DictPoint(object):
+    def __init__(self, row: int, col: int) -> None:
+        self.row = int(row)
+        self.col = int(col)
+
+
+class DictRange(object):
+    def __init__(self, start: DictPoint, end: DictPoint) -> None:
+        self.start = start
+        self.end = end
+
+
+class DictDiagnostic(object):
+    def __init__(self, lsp_diagnostic: dict) -> None:
+        self.message = lsp_diagnostic['message']
+        lsp_range = lsp_diagnostic['range']
+        self.range = DictRange(
+            DictPoint(lsp_range['start']['line'], lsp_range['start']['character']),
+            DictPoint(lsp_range['end']['line'], lsp_range['end']['character']))
+        self.severity = lsp_diagnostic.get('severity', 1)
+        self.source = lsp_diagnostic.get('source')
+        self._lsp_diagnostic = lsp_diagnostic
+
+
+def publish_diagnostics(count: int) -> str:
+    return json.dumps([{
+        "range": {"start": {"line": i, "character": 4}, "end": {"line": i, "character": 12}},
+        "severity": 1 + i % 4,
+        "source": "tsserver",
+        "code": 2300 + i % 50,
+        "message": "Duplicate identifier 'item{}'.".format(i % 100)
+    } for i in range(0, count)])
+
+
+def measure(convert, payload: str, count: int) -> float:
+    # the parsed payload is made inside the trace, as diagnostics that keep parts of it keep them alive.
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = convert(json.loads(payload))
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(kept) == count
+    return (after - before) / count
+
+
+def main() -> None:
+    count = 100000
+    payload = publish_diagnostics(count)
+    print("bytes per diagnostic, for {} diagnostics:".format(count))
+    results = [
+        ("dict objects with LSP dict", measure(lambda items: [DictDiagnostic(item) for item in items], payload, count)),
+        ("slotted Diagnostic", measure(Diagnostic.from_lsp_list, payload, count))
+    ]
+    for name, size in results:
+        print("  {:<28} {:>8.0f}".format(name, size))
+
+
+if __name__ == "__main__":
+    main()
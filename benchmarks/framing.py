@@ -0,0 +1,55 @@
+"""
+Throughput benchmark for the Content-Length framing decoder.
+
+Run from the repository root:
+
+    python -m benchmarks.framing
+"""
+import json
+import time
+
+from plugin.core.transports import ContentLengthDecoder, READ_CHUNK_SIZE
+
+
+def make_completion_response(items: int) -> bytes:
+    response = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "result": {
+            "isIncomplete": False,
+            "items": [{
+                "label": "completion_item_{}".format(i),
+                "kind": 3,
+                "detail": "def completion_item_{}(arg1: int, arg2: str) -> None".format(i),
+                "sortText": "{:08}".format(i),
+                "insertText": "completion_item_{}".format(i)
+            } for i in range(0, items)]
+        }
+    }
+    content = json.dumps(response).encode("UTF-8")
+    return b"Content-Length: " + str(len(content)).encode("ascii") + b"\r\n\r\n" + content
+
+
+def run(data: bytes, chunk_size: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(0, repeat):
+        decoder = ContentLengthDecoder()
+        start = time.perf_counter()
+        for i in range(0, len(data), chunk_size):
+            decoder.feed(data[i:i + chunk_size])
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    for items in (10000, 50000, 100000):
+        message = make_completion_response(items)
+        data = message * 3
+        for chunk_size in (4096, READ_CHUNK_SIZE):
+            elapsed = run(data, chunk_size, 5)
+            print("{:>6} items, {:>6.1f} MB, {:>5} byte reads: {:>8.1f} MB/s".format(
+                items, len(data) / 1e6, chunk_size, len(data) / 1e6 / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 import sublime
 import sublime_plugin
+from concurrent.futures import Future
 
 try:
     from typing import Any, List, Dict, Tuple, Callable, Optional
     assert Any and List and Dict and Tuple and Callable and Optional
+    assert Future
 except ImportError:
     pass
 
@@ -25,7 +27,6 @@ class CompletionState(object):
     IDLE = 0
     REQUESTING = 1
     APPLYING = 2
-    CANCELLING = 3
 
 
 resolvable_completion_items = []  # type: List[Any]
@@ -131,7 +132,7 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
         self.resolve_details = []  # type: List[Tuple[str, str]]
         self.state = CompletionState.IDLE
         self.completions = []  # type: List[Any]
-        self.next_request = None  # type: Optional[Tuple[str, List[int]]]
+        self.request = None  # type: Optional[Future]
         self.last_prefix = ""
         self.last_location = 0
 
@@ -201,7 +202,9 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
         # cancel current completion if the previous input is an space
         prev_char = self.view.substr(self.view.sel()[0].begin() - 1)
         if self.state == CompletionState.REQUESTING and prev_char.isspace():
-            self.state = CompletionState.CANCELLING
+            if self.request:
+                self.request.cancel()
+            self.state = CompletionState.IDLE
 
     def on_query_completions(self, prefix, locations):
         if prefix != "" and self.view.match_selector(locations[0], NO_COMPLETION_SCOPES):
@@ -216,17 +219,14 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
 
         if self.enabled:
             reuse_completion = self.is_same_completion(prefix, locations)
-            if self.state == CompletionState.IDLE:
+            if self.state in (CompletionState.IDLE, CompletionState.REQUESTING):
+                # a request still in flight is superseded by the new one.
                 if not reuse_completion:
                     self.last_prefix = prefix
                     self.last_location = locations[0]
                     self.do_request(prefix, locations)
                     self.completions = []
 
-            elif self.state in (CompletionState.REQUESTING, CompletionState.CANCELLING):
-                self.next_request = (prefix, locations)
-                self.state = CompletionState.CANCELLING
-
             elif self.state == CompletionState.APPLYING:
                 self.state = CompletionState.IDLE
 
@@ -237,7 +237,6 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
             )
 
     def do_request(self, prefix: str, locations: 'List[int]'):
-        self.next_request = None
         view = self.view
 
         # don't store client so we can handle restarts
@@ -249,10 +248,11 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
             global_events.publish("view.on_purge_changes", self.view)
             document_position = get_document_position(view, locations[0])
             if document_position:
-                client.send_request(
+                self.request = client.send_request(
                     Request.complete(document_position),
                     self.handle_response,
-                    self.handle_error)
+                    self.handle_error,
+                    supersede_key=view.id())
                 self.state = CompletionState.REQUESTING
 
     def format_completion(self, item: dict) -> 'Tuple[str, str]':
@@ -321,11 +321,6 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
             self.state = CompletionState.APPLYING
             self.view.run_command("hide_auto_complete")
             self.run_auto_complete()
-        elif self.state == CompletionState.CANCELLING:
-            if self.next_request:
-                prefix, locations = self.next_request
-                self.do_request(prefix, locations)
-                self.state = CompletionState.IDLE
         else:
             debug('Got unexpected response while in state {}'.format(self.state))
 
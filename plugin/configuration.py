@@ -8,7 +8,7 @@ from .core.configurations import (
     create_window_configs,
     get_global_client_config
 )
-from .core.registry import config_for_scope, windows
+from .core.registry import scope_config, windows
 from .core.events import global_events
 from .core.workspace import enable_in_project, disable_in_project
 
@@ -20,7 +20,7 @@ except ImportError:
 
 
 def detect_supportable_view(view: sublime.View):
-    config = config_for_scope(view)
+    config = scope_config(view)
     if not config:
         available_config = get_global_client_config(view)
         if available_config:
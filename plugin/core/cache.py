@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from typing import Any, Callable, Dict, Hashable
+    assert Any and Callable and Dict and Hashable
+except ImportError:
+    pass
+
+
+_missing = object()
+
+
+class MeasuredCache(object):
+    """
+    A bounded least-recently-used cache that counts its hits and misses, and the time spent
+    computing the misses, so the time it saves can be estimated.
+    """
+
+    def __init__(self, limit: int = 1000) -> None:
+        self.limit = limit
+        self._values = OrderedDict()  # type: OrderedDict[Hashable, Any]
+        self.hits = 0
+        self.misses = 0
+        self.miss_time = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, key: 'Hashable', compute: 'Callable[[], Any]') -> 'Any':
+        with self._lock:
+            value = self._values.get(key, _missing)
+            if value is not _missing:
+                self.hits += 1
+                self._values.move_to_end(key)
+                return value
+
+        # computed without holding the lock, as computing can call back into Sublime Text.
+        started = time.perf_counter()
+        value = compute()
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.miss_time += elapsed
+            self.misses += 1
+            self._values[key] = value
+            if len(self._values) > self.limit:
+                self._values.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def stats(self) -> 'Dict[str, Any]':
+        lookups = self.hits + self.misses
+        average_miss_time = self.miss_time / self.misses if self.misses else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_time": self.hits * average_miss_time
+        }
+
+    def describe(self) -> str:
+        stats = self.stats()
+        return "{} hits, {} misses ({:.0%} hit rate), saved {:.1f} ms".format(
+            stats["hits"], stats["misses"], stats["hit_rate"], stats["saved_time"] * 1000)
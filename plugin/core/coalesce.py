@@ -0,0 +1,48 @@
+import threading
+from collections import OrderedDict
+
+try:
+    from typing import Any, Hashable, List
+    assert Any and Hashable and List
+except ImportError:
+    pass
+
+
+class LatestUpdates(object):
+    """
+    Buffers updates by key, keeping only the latest one for each, until they are taken in a batch.
+
+    Updates keep the position of the first pending update for their key. Safe to use from
+    several threads.
+    """
+
+    def __init__(self) -> None:
+        self._pending = OrderedDict()  # type: OrderedDict[Hashable, Any]
+        self._lock = threading.Lock()
+        self.received = 0
+        self.coalesced = 0
+        self.batches = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def put(self, key: 'Hashable', update: 'Any') -> bool:
+        """Buffers an update. Returns True if nothing was pending, so a flush should be scheduled."""
+        with self._lock:
+            self.received += 1
+            if key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = update
+            return len(self._pending) == 1
+
+    def take(self) -> 'List[Any]':
+        """The pending updates, in order, leaving none pending."""
+        with self._lock:
+            updates = list(self._pending.values())
+            self._pending = OrderedDict()
+            if updates:
+                self.batches += 1
+            return updates
+
+    def describe(self) -> str:
+        return "{} updates in {} batches, {} coalesced".format(self.received, self.batches, self.coalesced)
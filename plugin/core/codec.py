@@ -0,0 +1,77 @@
+import json
+from .logging import debug
+
+try:
+    from typing import Any, Optional, Tuple
+    assert Any and Optional and Tuple
+except ImportError:
+    pass
+
+
+class JsonCodec(object):
+    """Encodes payloads to UTF-8 JSON and decodes received messages with the stdlib json module."""
+
+    name = "json"
+
+    def encode(self, payload: 'Any') -> bytes:
+        return json.dumps(payload, sort_keys=False, ensure_ascii=False).encode("UTF-8")
+
+    def decode(self, message: str) -> 'Any':
+        return json.loads(message)
+
+
+class OrjsonCodec(JsonCodec):
+
+    name = "orjson"
+
+    def __init__(self, module: 'Any') -> None:
+        self._orjson = module
+
+    def encode(self, payload: 'Any') -> bytes:
+        try:
+            return self._orjson.dumps(payload)
+        except TypeError:
+            # orjson rejects what json accepts in a few cases, like integers over 64 bits
+            # and non-string keys.
+            return super().encode(payload)
+
+    def decode(self, message: str) -> 'Any':
+        return self._orjson.loads(message)
+
+
+class UjsonCodec(JsonCodec):
+
+    name = "ujson"
+
+    def __init__(self, module: 'Any') -> None:
+        self._ujson = module
+
+    def encode(self, payload: 'Any') -> bytes:
+        try:
+            return self._ujson.dumps(payload, ensure_ascii=False, escape_forward_slashes=False).encode("UTF-8")
+        except (TypeError, OverflowError):
+            return super().encode(payload)
+
+    def decode(self, message: str) -> 'Any':
+        return self._ujson.loads(message)
+
+
+# Faster implementations to try, in order of preference, before falling back to json.
+CODECS = (("orjson", OrjsonCodec), ("ujson", UjsonCodec))  # type: Tuple[Tuple[str, Any], ...]
+
+
+def load_codec(names: 'Optional[Tuple[str, ...]]' = None) -> JsonCodec:
+    """Returns the first codec whose module can be imported, or the stdlib codec."""
+    for name, codec_class in CODECS:
+        if names is not None and name not in names:
+            continue
+        try:
+            module = __import__(name)
+        except ImportError:
+            continue
+        debug("using {} to encode and decode messages".format(name))
+        return codec_class(module)
+    return JsonCodec()
+
+
+default_codec = load_codec()
@@ -1,4 +1,3 @@
-import re
 import sublime
 from copy import deepcopy
 
@@ -6,6 +5,8 @@ from .settings import ClientConfig, client_configs, LanguageConfig
 from .logging import debug
 from .workspace import get_project_config
 from .windows import ViewLike, WindowLike, ConfigRegistry
+from .syntaxes import SyntaxIndex, syntax_index
+from .cache import MeasuredCache
 
 assert ClientConfig
 
@@ -77,31 +78,14 @@ def apply_window_settings(client_config: 'ClientConfig', window: 'sublime.Window
             client_settings,
             client_env,
             overrides.get("tcp_host", client_config.tcp_host),
+            overrides.get("tcp_ready_pattern", client_config.tcp_ready_pattern),
         )
 
     return client_config
 
 
 def is_supported_syntax(syntax: str) -> bool:
-    for config in client_configs.all:
-        for language in config.languages:
-            if re.search(r'|'.join(r'\b%s\b' % re.escape(s) for s in language.syntaxes), syntax, re.IGNORECASE):
-                return True
-    return False
-
-
-def config_supports_syntax(config: 'ClientConfig', syntax: str) -> bool:
-    for language in config.languages:
-        if re.search(r'|'.join(r'\b%s\b' % re.escape(s) for s in language.syntaxes), syntax, re.IGNORECASE):
-            return True
-    return False
-
-
-def syntax_language(config: 'ClientConfig', syntax: str) -> 'Optional[LanguageConfig]':
-    for language in config.languages:
-        if re.search(r'|'.join(r'\b%s\b' % re.escape(s) for s in language.syntaxes), syntax, re.IGNORECASE):
-            return language
-    return None
+    return syntax_index(client_configs.all).is_supported(syntax)
 
 
 class ConfigManager(object):
@@ -113,35 +97,53 @@ class ConfigManager(object):
 class WindowConfigManager(object):
     def __init__(self, configs: 'List[ClientConfig]') -> None:
         self.all = configs
+        self._syntax_index = SyntaxIndex(configs)
+        self._scope_configs = MeasuredCache()
 
     def is_supported(self, view: 'Any') -> bool:
         return self.scope_config(view) is not None
 
     def scope_config(self, view: 'Any', point=None) -> 'Optional[ClientConfig]':
-        return get_scope_client_config(view, self.all, point)
+        """
+        The best config for the scope at point, or at the first selection.
+
+        Resolution only depends on the scope, the syntax and the view's languages, so it is
+        cached by those until the configs are updated.
+        """
+        if point is None:
+            sel = view.sel()
+            if len(sel) == 0:
+                return None
+            point = sel[0].begin()
+        languages = view.settings().get('lsp_language', None)
+        key = (view.id(), view.settings().get("syntax"), view.scope_name(point),
+               tuple(sorted(languages)) if languages is not None else None)
+        return self._scope_configs.get(key, lambda: get_scope_client_config(view, self.all, point))
+
+    def scope_cache_stats(self) -> 'Dict[str, Any]':
+        return self._scope_configs.stats()
 
     def syntax_configs(self, view: 'Any') -> 'List[ClientConfig]':
         syntax = view.settings().get("syntax")
-        return list(filter(lambda c: config_supports_syntax(c, syntax) and c.enabled, self.all))
+        return [config for config, _ in self._syntax_index.languages(syntax) if config.enabled]
 
     def syntax_supported(self, view: ViewLike) -> bool:
         syntax = view.settings().get("syntax")
-        for found in filter(lambda c: config_supports_syntax(c, syntax) and c.enabled, self.all):
-            return True
-        return False
+        return any(config.enabled for config, _ in self._syntax_index.languages(syntax))
 
     def syntax_config_languages(self, view: ViewLike) -> 'Dict[str, LanguageConfig]':
         syntax = view.settings().get("syntax")
         config_languages = {}
-        for config in self.all:
+        for config, language in self._syntax_index.languages(syntax):
             if config.enabled:
-                language = syntax_language(config, syntax)
-                if language:
-                    config_languages[config.name] = language
+                config_languages[config.name] = language
         return config_languages
 
     def update(self, configs: 'List[ClientConfig]') -> None:
         self.all = configs
+        self._syntax_index = SyntaxIndex(configs)
+        debug('scope config cache:', self._scope_configs.describe())
+        self._scope_configs.clear()
 
 
 def _merge_dicts(dict_a: dict, dict_b: dict) -> dict:
@@ -0,0 +1,78 @@
+from .logging import debug
+
+try:
+    from typing import Dict, Iterable, Optional, Tuple
+    assert Dict and Iterable and Optional and Tuple
+except ImportError:
+    pass
+
+
+DEFAULT_DEBOUNCE = 0.5
+# Weight of the newest sample in the moving averages.
+SMOOTHING = 0.3
+# Wait this many typical keystroke intervals, so a burst of typing is sent as one change.
+TYPING_FACTOR = 2.0
+
+
+def moving_average(average: 'Optional[float]', sample: float) -> float:
+    return sample if average is None else SMOOTHING * sample + (1 - SMOOTHING) * average
+
+
+class AdaptiveDebounce(object):
+    """
+    Chooses how long to wait after an edit before sending didChange, per buffer.
+
+    The window covers the buffer's typical interval between keystrokes, so changes are sent
+    once typing pauses, and the slowest server's time to respond to a change, so a server is
+    not sent changes faster than it can process them. It is kept between floor and ceiling
+    (in seconds).
+    """
+
+    def __init__(self, floor: float, ceiling: float) -> None:
+        self.floor = floor
+        self.ceiling = ceiling
+        self._last_modified = {}  # type: Dict[int, float]
+        self._typing_interval = {}  # type: Dict[int, float]
+        self._sent = {}  # type: Dict[Tuple[str, str], float]
+        self._turnaround = {}  # type: Dict[str, float]
+        self.windows = {}  # type: Dict[int, float]
+
+    def on_modified(self, buffer_id: int, now: float) -> None:
+        last_modified = self._last_modified.get(buffer_id)
+        self._last_modified[buffer_id] = now
+        if last_modified is not None:
+            interval = now - last_modified
+            # longer intervals are pauses in typing, not its pace.
+            if interval < self.ceiling:
+                self._typing_interval[buffer_id] = moving_average(self._typing_interval.get(buffer_id), interval)
+
+    def on_sent(self, config_name: str, uri: str, now: float) -> None:
+        self._sent[(config_name, uri)] = now
+
+    def on_diagnostics(self, config_name: str, uri: str, now: float) -> None:
+        sent = self._sent.pop((config_name, uri), None)
+        if sent is not None:
+            self._turnaround[config_name] = moving_average(self._turnaround.get(config_name), now - sent)
+
+    def turnaround(self, config_name: str) -> 'Optional[float]':
+        """Average time from sending a change to receiving the diagnostics for it."""
+        return self._turnaround.get(config_name)
+
+    def window(self, buffer_id: int, server_times: 'Iterable[Optional[float]]') -> float:
+        """
+        The debounce window for a buffer, given the applicable servers' turnarounds from a change
+        to its diagnostics.
+        """
+        candidates = [TYPING_FACTOR * self._typing_interval[buffer_id]] if buffer_id in self._typing_interval else []
+        candidates.extend(t for t in server_times if t is not None)
+        window = min(max(max(candidates) if candidates else DEFAULT_DEBOUNCE, self.floor), self.ceiling)
+        previous = self.windows.get(buffer_id)
+        self.windows[buffer_id] = window
+        if previous is None or abs(window - previous) >= 0.05:
+            debug("didChange debounce for buffer {} is {:.0f} ms".format(buffer_id, window * 1000))
+        return window
+
+    def forget(self, buffer_id: int) -> None:
+        self._last_modified.pop(buffer_id, None)
+        self._typing_interval.pop(buffer_id, None)
+        self.windows.pop(buffer_id, None)
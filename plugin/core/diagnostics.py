@@ -1,10 +1,15 @@
 import sublime
+import sys
 
 from .logging import debug
 from .url import uri_to_filename
-from .protocol import Diagnostic
+from .protocol import Diagnostic, DiagnosticSeverity
 from .events import global_events
-from .views import range_to_region
+from .intervals import IntervalTree
+from .views import utf16_position
+from .coalesce import LatestUpdates
+from .limits import limit_diagnostics, most_severe
+from .settings import settings
 from .windows import WindowLike, ViewLike
 
 assert Diagnostic
@@ -20,10 +25,90 @@ except ImportError:
 global_diagnostics = dict(
 )  # type: Dict[int, Dict[str, Dict[str, List[Diagnostic]]]]
 
+# The diagnostics of all sources for each file, indexed by their ranges.
+diagnostic_indexes = dict(
+)  # type: Dict[int, Dict[str, IntervalTree]]
+
+
+def index_diagnostics(file_diagnostics: 'Dict[str, List[Diagnostic]]') -> IntervalTree:
+    return IntervalTree(
+        ((d.range.start.row, d.range.start.col), (d.range.end.row, d.range.end.col), d)
+        for source_diagnostics in file_diagnostics.values() for d in source_diagnostics)
+
+
+def _update_diagnostic_index(window_id: int, file_path: str) -> None:
+    file_diagnostics = global_diagnostics.get(window_id, {}).get(file_path)
+    if file_diagnostics:
+        diagnostic_indexes.setdefault(window_id, dict())[file_path] = index_diagnostics(file_diagnostics)
+    else:
+        diagnostic_indexes.get(window_id, {}).pop(file_path, None)
+
+
+# Running (errors, warnings) totals per window and per file, kept in step with global_diagnostics.
+window_counts = dict()  # type: Dict[int, Tuple[int, int]]
+file_counts = dict()  # type: Dict[int, Dict[str, Tuple[int, int]]]
+
+
+def count_severities(diagnostics: 'List[Diagnostic]') -> 'Tuple[int, int]':
+    errors = 0
+    warnings = 0
+    for diagnostic in diagnostics:
+        if diagnostic.severity == DiagnosticSeverity.Error:
+            errors += 1
+        elif diagnostic.severity == DiagnosticSeverity.Warning:
+            warnings += 1
+    return errors, warnings
+
+
+def _update_counts(window_id: int, file_path: str, removed: 'Tuple[int, int]', added: 'Tuple[int, int]') -> None:
+    if removed == added:
+        return
+    errors, warnings = window_counts.get(window_id, (0, 0))
+    window_counts[window_id] = (errors - removed[0] + added[0], warnings - removed[1] + added[1])
+    window_file_counts = file_counts.setdefault(window_id, dict())
+    errors, warnings = window_file_counts.get(file_path, (0, 0))
+    counts = (errors - removed[0] + added[0], warnings - removed[1] + added[1])
+    if counts == (0, 0):
+        window_file_counts.pop(file_path, None)
+    else:
+        window_file_counts[file_path] = counts
+
+
+# Number of diagnostics kept per window, and of those left out over the limits per window, file and source.
+window_sizes = dict()  # type: Dict[int, int]
+dropped_diagnostics = dict()  # type: Dict[int, Dict[str, Dict[str, int]]]
+
+
+def _set_dropped(window_id: int, file_path: str, source: str, dropped: int) -> None:
+    if dropped:
+        dropped_diagnostics.setdefault(window_id, dict()).setdefault(file_path, dict())[source] = dropped
+    else:
+        file_dropped = dropped_diagnostics.get(window_id, {}).get(file_path)
+        if file_dropped is not None:
+            file_dropped.pop(source, None)
+            if not file_dropped:
+                del dropped_diagnostics[window_id][file_path]
+
+
+def get_dropped_count(window: 'Any', file_path: str) -> int:
+    """The number of a file's diagnostics left out over the per-file and per-window limits."""
+    return sum(dropped_diagnostics.get(window.id(), {}).get(file_path, {}).values())
+
+
+def get_window_counts(window: 'Any') -> 'Tuple[int, int]':
+    """The numbers of errors and warnings in a window."""
+    return window_counts.get(window.id(), (0, 0))
+
+
+def get_file_counts(window: 'Any', file_path: str) -> 'Tuple[int, int]':
+    """The numbers of errors and warnings of a file in a window."""
+    return file_counts.get(window.id(), {}).get(file_path, (0, 0))
+
 
 def update_file_diagnostics(window: sublime.Window, file_path: str, source: str,
                             diagnostics: 'List[Diagnostic]') -> bool:
     updated = False
+    previous = global_diagnostics.get(window.id(), {}).get(file_path, {}).get(source, [])
     if diagnostics:
         file_diagnostics = global_diagnostics.setdefault(window.id(), dict()).setdefault(
             file_path, dict())
@@ -38,16 +123,39 @@ def update_file_diagnostics(window: sublime.Window, file_path: str, source: str,
                     del window_diagnostics[file_path][source]
                 if not window_diagnostics[file_path]:
                     del window_diagnostics[file_path]
+    if updated:
+        _update_diagnostic_index(window.id(), file_path)
+        _update_counts(window.id(), file_path, count_severities(previous), count_severities(diagnostics))
+        window_sizes[window.id()] = window_sizes.get(window.id(), 0) + len(diagnostics) - len(previous)
     return updated
 
 
 class DiagnosticsUpdate(object):
     def __init__(self, window: sublime.Window, client_name: str,
-                 file_path: str, diagnostics: 'List[Diagnostic]') -> 'None':
+                 file_path: str, diagnostics: 'List[Diagnostic]', dropped: int = 0) -> 'None':
         self.window = window
         self.client_name = client_name
         self.file_path = file_path
         self.diagnostics = diagnostics
+        # diagnostics left out over the limits
+        self.dropped = dropped
+
+
+# Milliseconds to buffer diagnostics before applying them, so a burst of publishDiagnostics
+# for many files is drawn once, with only the latest diagnostics of each file and source.
+DIAGNOSTICS_FLUSH_DELAY = 50
+
+# DiagnosticsUpdates waiting to be applied, by window id, file and source.
+pending_diagnostics = LatestUpdates()
+
+
+def queue_diagnostics_update(update: DiagnosticsUpdate) -> None:
+    """
+    Buffers an update to be applied on the main thread, which is the only one to touch the
+    stored diagnostics and their counts.
+    """
+    if pending_diagnostics.put((update.window.id(), update.file_path, update.client_name), update):
+        sublime.set_timeout(flush_diagnostics, DIAGNOSTICS_FLUSH_DELAY)
 
 
 def handle_client_diagnostics(window: sublime.Window, client_name: str, update: dict):
@@ -55,17 +163,51 @@ def handle_client_diagnostics(window: sublime.Window, client_name: str, update:
     if maybe_file_uri is not None:
         file_path = uri_to_filename(maybe_file_uri)
 
-        diagnostics = list(
-            Diagnostic.from_lsp(item) for item in update.get('diagnostics', []))
+        # diagnostics that can't be shown are not kept, or even converted.
+        lsp_diagnostics, dropped = limit_diagnostics(update.get('diagnostics', []),
+                                                     settings.show_diagnostics_severity_level,
+                                                     settings.diagnostics_max_per_file or -1)
+        diagnostics = Diagnostic.from_lsp_list(lsp_diagnostics)
 
-        if update_file_diagnostics(window, file_path, client_name, diagnostics):
-            global_events.publish("document.diagnostics",
-                                  DiagnosticsUpdate(window, client_name, file_path, diagnostics))
+        queue_diagnostics_update(DiagnosticsUpdate(window, client_name, file_path, diagnostics, dropped))
     else:
         debug('missing uri in diagnostics update')
 # TODO: expose updates to features
 
 
+def flush_diagnostics() -> None:
+    """
+    Applies the pending diagnostics updates, publishing document.diagnostics for each file
+    that changed and then document.diagnostics_flushed with the windows that had changes.
+    """
+    windows = []  # type: List[sublime.Window]
+    updates = pending_diagnostics.take()
+    for update in updates:
+        limit_window_diagnostics(update)
+        _set_dropped(update.window.id(), update.file_path, update.client_name, update.dropped)
+        if update_file_diagnostics(update.window, update.file_path, update.client_name, update.diagnostics):
+            global_events.publish("document.diagnostics", update)
+            if update.window not in windows:
+                windows.append(update.window)
+    if updates:
+        debug('applied {} diagnostics updates ({} in total)'.format(len(updates), pending_diagnostics.describe()))
+    if windows:
+        global_events.publish("document.diagnostics_flushed", windows)
+
+
+def limit_window_diagnostics(update: DiagnosticsUpdate) -> None:
+    """Leaves the least severe diagnostics out of an update that would take its window over the limit."""
+    if settings.diagnostics_max_per_window <= 0:
+        return
+    window_id = update.window.id()
+    previous = global_diagnostics.get(window_id, {}).get(update.file_path, {}).get(update.client_name, [])
+    room = max(settings.diagnostics_max_per_window - (window_sizes.get(window_id, 0) - len(previous)), 0)
+    update.diagnostics, dropped = most_severe(update.diagnostics, room, lambda d: d.severity)
+    if dropped:
+        debug('left out {} diagnostics of {} over the window limit'.format(dropped, update.file_path))
+        update.dropped += dropped
+
+
 def remove_diagnostics(view: sublime.View, client_name: str):
     """Removes diagnostics for a file
     """
@@ -73,8 +215,8 @@ def remove_diagnostics(view: sublime.View, client_name: str):
 
     file_path = view.file_name()
     if file_path:
-        if update_file_diagnostics(window, file_path, client_name, []):
-            global_events.publish("document.diagnostics", DiagnosticsUpdate(window, client_name, file_path, []))
+        # replaces any pending update for the file, and is applied and drawn like one.
+        queue_diagnostics_update(DiagnosticsUpdate(window, client_name, file_path, []))
 
 
 class GlobalDiagnostics(object):
@@ -87,21 +229,27 @@ class GlobalDiagnostics(object):
         remove_diagnostics(view, client_name)
 
 
+def get_diagnostic_index(view: sublime.View) -> 'Optional[IntervalTree]':
+    window = view.window()
+    file_path = view.file_name()
+    if file_path and window:
+        return diagnostic_indexes.get(window.id(), {}).get(file_path)
+    return None
+
+
 def get_line_diagnostics(view, point):
+    index = get_diagnostic_index(view)
+    if not index:
+        return ()
     row, _ = view.rowcol(point)
-    diagnostics = get_diagnostics_for_view(view)
-    return tuple(
-        diagnostic for diagnostic in diagnostics
-        if diagnostic.range.start.row <= row <= diagnostic.range.end.row
-    )
+    return tuple(index.overlapping((row, 0), (row, sys.maxsize)))
 
 
 def get_point_diagnostics(view, point):
-    diagnostics = get_diagnostics_for_view(view)
-    return tuple(
-        diagnostic for diagnostic in diagnostics
-        if range_to_region(diagnostic.range, view).contains(point)
-    )
+    index = get_diagnostic_index(view)
+    if not index:
+        return ()
+    return tuple(index.containing(utf16_position(view, point)))
 
 
 def get_window_diagnostics(window: sublime.Window) -> 'Optional[Dict[str, Dict[str, List[Diagnostic]]]]':
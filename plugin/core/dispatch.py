@@ -0,0 +1,79 @@
+import threading
+from collections import deque
+from queue import Queue
+from .logging import exception_log
+
+try:
+    from typing import Any, Callable, Deque, Dict, Hashable, List
+    assert Any and Callable and Deque and Dict and Hashable and List
+except ImportError:
+    pass
+
+
+class InlineDispatcher(object):
+    """Runs handlers immediately on the calling thread."""
+
+    def dispatch(self, key: 'Hashable', handler: 'Callable[[], None]') -> None:
+        handler()
+
+
+class WorkerDispatcher(object):
+    """
+    Runs handlers on a pool of worker threads.
+
+    Handlers dispatched with the same key run one at a time, in the order they were
+    dispatched. Handlers with different keys may run concurrently.
+    """
+
+    def __init__(self, workers: int = 2) -> None:
+        self._workers = workers
+        self._threads = []  # type: List[threading.Thread]
+        self._lock = threading.Lock()
+        self._pending = {}  # type: Dict[Hashable, Deque[Callable[[], None]]]
+        self._ready = Queue()  # type: Queue[Hashable]
+
+    def dispatch(self, key: 'Hashable', handler: 'Callable[[], None]') -> None:
+        with self._lock:
+            if not self._threads:
+                self._start()
+            handlers = self._pending.get(key)
+            if handlers is not None:
+                # a worker owns this key and will get to the handler after the ones before it.
+                handlers.append(handler)
+                return
+            self._pending[key] = deque([handler])
+        self._ready.put(key)
+
+    def queued(self) -> int:
+        with self._lock:
+            return sum(len(handlers) for handlers in self._pending.values())
+
+    def _start(self) -> None:
+        for i in range(0, self._workers):
+            thread = threading.Thread(target=self._work, name="LSP dispatch {}".format(i), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self) -> None:
+        while True:
+            key = self._ready.get()
+            with self._lock:
+                handler = self._pending[key].popleft()
+            try:
+                handler()
+            except Exception as err:
+                exception_log("Error dispatching server payload", err)
+            with self._lock:
+                has_more = bool(self._pending[key])
+                if not has_more:
+                    del self._pending[key]
+            if has_more:
+                # requeue behind other keys so one busy document can not starve the rest.
+                self._ready.put(key)
+
+
+# shared by all clients for server notifications and requests.
+notification_dispatcher = WorkerDispatcher()
+
+# shared by event loop transports, to handle what they receive off the event loop thread.
+receive_dispatcher = WorkerDispatcher()
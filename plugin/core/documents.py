@@ -92,3 +92,22 @@ class DocumentSyncListener(sublime_plugin.ViewEventListener):
     def on_close(self):
         if self.view.file_name() and self.view.is_primary():
             global_events.publish("view.on_close", self.view)
+
+
+class LspShowLargeFilesCommand(sublime_plugin.WindowCommand):
+    """Lists the views handled by the large file policy, and why."""
+
+    def run(self):
+        self._views = [view for view in self.window.views() if view.settings().get("lsp_large_file")]
+        if not self._views:
+            self.window.status_message("No large files are open")
+            return
+        items = [[view.file_name() or view.name(),
+                  "{}: {}".format(view.settings().get("lsp_large_file").replace("_", " "),
+                                  view.settings().get("lsp_large_file_reason"))]
+                 for view in self._views]
+        self.window.show_quick_panel(items, self._on_done)
+
+    def _on_done(self, index):
+        if index > -1:
+            self.window.focus_view(self._views[index])
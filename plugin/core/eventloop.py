@@ -0,0 +1,142 @@
+import os
+import select
+import threading
+from .logging import exception_log
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore
+
+try:
+    from typing import Callable, Dict, Optional
+    assert Callable and Dict and Optional
+except ImportError:
+    pass
+
+
+# select() only accepts sockets on Windows, so pipes to language servers can't be multiplexed there.
+event_loop_supported = fcntl is not None
+use_event_loop = False
+
+
+def set_event_loop_enabled(enabled: bool) -> None:
+    global use_event_loop
+    use_event_loop = enabled and event_loop_supported
+
+
+def event_loop_enabled() -> bool:
+    return use_event_loop
+
+
+def set_non_blocking(fd: int) -> None:
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+
+class EventLoop(object):
+    """
+    A single thread waiting on the pipes and sockets of all language servers with select(),
+    calling back when one is readable or writable.
+
+    Callbacks run on the loop thread and must not block. The thread is started on first use.
+    """
+
+    def __init__(self) -> None:
+        self._readers = {}  # type: Dict[int, Callable[[], None]]
+        self._writers = {}  # type: Dict[int, Callable[[], None]]
+        self._lock = threading.Lock()
+        self._thread = None  # type: Optional[threading.Thread]
+        self._wakeup_read = -1
+        self._wakeup_write = -1
+
+    def add_reader(self, fd: int, callback: 'Callable[[], None]') -> None:
+        with self._lock:
+            self._readers[fd] = callback
+            self._start()
+        self._wakeup()
+
+    def remove_reader(self, fd: int) -> None:
+        with self._lock:
+            self._readers.pop(fd, None)
+        self._wakeup()
+
+    def add_writer(self, fd: int, callback: 'Callable[[], None]') -> None:
+        with self._lock:
+            if self._writers.get(fd) == callback:
+                return
+            self._writers[fd] = callback
+            self._start()
+        self._wakeup()
+
+    def remove_writer(self, fd: int) -> None:
+        with self._lock:
+            self._writers.pop(fd, None)
+        self._wakeup()
+
+    def watched(self) -> int:
+        """Number of descriptors the loop is waiting on."""
+        with self._lock:
+            return len(set(self._readers) | set(self._writers))
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._wakeup_read, self._wakeup_write = os.pipe()
+            set_non_blocking(self._wakeup_read)
+            set_non_blocking(self._wakeup_write)
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _wakeup(self) -> None:
+        # interrupts a select() that is still waiting on the previous set of descriptors.
+        if self._wakeup_write >= 0:
+            try:
+                os.write(self._wakeup_write, b"\0")
+            except OSError:
+                pass  # the pipe is full, so a wakeup is pending already
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                readers = list(self._readers)
+                writers = list(self._writers)
+            try:
+                readable, writable, _ = select.select([self._wakeup_read] + readers, writers, [])
+            except (OSError, ValueError) as err:
+                exception_log("Failure waiting for language server I/O", err)
+                self._drop_closed()
+                continue
+
+            for fd in readable:
+                if fd == self._wakeup_read:
+                    try:
+                        os.read(self._wakeup_read, 4096)
+                    except OSError:
+                        pass
+                else:
+                    self._call(self._readers, fd)
+            for fd in writable:
+                self._call(self._writers, fd)
+
+    def _call(self, callbacks: 'Dict[int, Callable[[], None]]', fd: int) -> None:
+        # the callback may have been removed by an earlier callback in the same round.
+        with self._lock:
+            callback = callbacks.get(fd)
+        if callback:
+            try:
+                callback()
+            except Exception as err:
+                exception_log("Failure handling language server I/O", err)
+
+    def _drop_closed(self) -> None:
+        # a descriptor was closed without being removed first; forget it so select() can continue.
+        with self._lock:
+            for callbacks in (self._readers, self._writers):
+                for fd in list(callbacks):
+                    try:
+                        os.fstat(fd)
+                    except OSError:
+                        del callbacks[fd]
+
+
+event_loop = EventLoop()
@@ -0,0 +1,76 @@
+try:
+    from typing import Any, Iterable, List, Optional, Tuple
+    assert Any and Iterable and List and Optional and Tuple
+except ImportError:
+    pass
+
+
+class _Node(object):
+    def __init__(self, center: 'Any', items: 'List[Tuple[Any, Any, int, Any]]') -> None:
+        self.center = center
+        self.by_start = sorted(items, key=lambda item: item[0])
+        self.by_end = sorted(items, key=lambda item: item[1], reverse=True)
+        self.left = None  # type: Optional[_Node]
+        self.right = None  # type: Optional[_Node]
+
+
+def _build(items: 'List[Tuple[Any, Any, int, Any]]') -> 'Optional[_Node]':
+    if not items:
+        return None
+    # the median start is the start of an interval, so every node holds at least that one.
+    center = sorted(item[0] for item in items)[len(items) // 2]
+    left = [item for item in items if item[1] < center]
+    right = [item for item in items if item[0] > center]
+    node = _Node(center, [item for item in items if item[0] <= center <= item[1]])
+    node.left = _build(left)
+    node.right = _build(right)
+    return node
+
+
+class IntervalTree(object):
+    """
+    A static centered interval tree over closed intervals of any comparable keys.
+
+    Finding the intervals overlapping a query takes O(log n + k) comparisons for k results,
+    which are given in the order the intervals were added.
+    """
+
+    def __init__(self, intervals: 'Iterable[Tuple[Any, Any, Any]]') -> None:
+        items = [(start, end, order, value) for order, (start, end, value) in enumerate(intervals)]
+        self.size = len(items)
+        self._root = _build(items)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def overlapping(self, low: 'Any', high: 'Any') -> 'List[Any]':
+        """The values of the intervals overlapping [low, high]."""
+        found = []  # type: List[Tuple[int, Any]]
+        nodes = [self._root]
+        while nodes:
+            node = nodes.pop()
+            if node is None:
+                continue
+            if high < node.center:
+                # every interval here ends at or after the center, so it overlaps if it starts in time.
+                for start, _, order, value in node.by_start:
+                    if start > high:
+                        break
+                    found.append((order, value))
+                nodes.append(node.left)
+            elif low > node.center:
+                for _, end, order, value in node.by_end:
+                    if end < low:
+                        break
+                    found.append((order, value))
+                nodes.append(node.right)
+            else:
+                found.extend((order, value) for _, _, order, value in node.by_start)
+                nodes.append(node.left)
+                nodes.append(node.right)
+        found.sort(key=lambda item: item[0])
+        return [value for _, value in found]
+
+    def containing(self, point: 'Any') -> 'List[Any]':
+        """The values of the intervals containing point."""
+        return self.overlapping(point, point)
@@ -0,0 +1,38 @@
+import re
+
+try:
+    from typing import Any, Callable, Dict, Optional
+    assert Any and Callable and Dict and Optional
+except ImportError:
+    pass
+
+
+# What to do with documents over the large file thresholds:
+# "skip" doesn't send them to language servers at all, "read_only" opens them but sends no
+# changes, "incremental" only syncs them with servers accepting incremental changes.
+LARGE_FILE_POLICIES = ("skip", "read_only", "incremental")
+
+_long_line_patterns = {}  # type: Dict[int, Any]
+
+
+def long_line_pattern(max_line_length: int) -> 'Any':
+    pattern = _long_line_patterns.get(max_line_length)
+    if pattern is None:
+        # anchored to line starts, so a search is linear in the text length.
+        pattern = re.compile(r"^[^\n]{%d}" % (max_line_length + 1), re.MULTILINE)
+        _long_line_patterns[max_line_length] = pattern
+    return pattern
+
+
+def large_file_reason(size: int, get_text: 'Callable[[], str]', max_size: int,
+                      max_line_length: int) -> 'Optional[str]':
+    """
+    Why a document is too large to be handled normally, if it is. A limit of 0 disables its check.
+
+    The text is only read if the size is within limits.
+    """
+    if max_size > 0 and size > max_size:
+        return "over {} characters".format(max_size)
+    if max_line_length > 0 and size > max_line_length and long_line_pattern(max_line_length).search(get_text()):
+        return "lines over {} characters".format(max_line_length)
+    return None
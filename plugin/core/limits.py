@@ -0,0 +1,29 @@
+from .protocol import DiagnosticSeverity
+
+try:
+    from typing import Any, Callable, List, Tuple
+    assert Any and Callable and List and Tuple
+except ImportError:
+    pass
+
+
+def lsp_severity(lsp_diagnostic: dict) -> int:
+    return lsp_diagnostic.get('severity') or DiagnosticSeverity.Error
+
+
+def limit_diagnostics(lsp_diagnostics: 'List[dict]', max_severity: int, limit: int) -> 'Tuple[List[dict], int]':
+    """
+    The LSP diagnostics at max_severity or more severe and, of those, the limit most severe ones
+    in their original order, with the number of diagnostics left out over the limit. A limit
+    below 0 keeps all of them.
+    """
+    return most_severe([d for d in lsp_diagnostics if lsp_severity(d) <= max_severity], limit, lsp_severity)
+
+
+def most_severe(diagnostics: 'List[Any]', limit: int, severity: 'Callable[[Any], int]') -> 'Tuple[List[Any], int]':
+    """The limit most severe diagnostics, in their original order, and the number left out."""
+    if limit < 0 or len(diagnostics) <= limit:
+        return diagnostics, 0
+    # sorted is stable, so diagnostics of the same severity are kept in order.
+    kept = sorted(sorted(range(len(diagnostics)), key=lambda i: severity(diagnostics[i]))[:limit])
+    return [diagnostics[i] for i in kept], len(diagnostics) - limit
@@ -0,0 +1,92 @@
+import re
+from bisect import bisect_right
+from .protocol import Point, Range
+
+try:
+    from typing import Dict, Iterable, List, Tuple
+    assert Dict and Iterable and List and Tuple
+except ImportError:
+    pass
+
+
+# characters outside the Basic Multilingual Plane take two UTF-16 code units.
+_astral = re.compile('[\U00010000-\U0010FFFF]')
+_newline = re.compile('\n')
+
+
+def utf16_to_offset(line: str, character: int) -> int:
+    """The offset in line of a column counted in UTF-16 code units."""
+    units = 0
+    for offset, c in enumerate(line):
+        if units >= character:
+            return offset
+        units += 2 if c >= '\U00010000' else 1
+    return len(line)
+
+
+def offset_to_utf16(line: str, offset: int) -> int:
+    """The column in UTF-16 code units of an offset in line."""
+    prefix = line[:offset]
+    return len(prefix) + len(_astral.findall(prefix))
+
+
+class LineIndex(object):
+    """
+    The line start offsets of a document, to convert LSP positions to offsets and back without
+    asking the editor for each one.
+
+    Columns are counted in UTF-16 code units, as in LSP. Only lines with characters outside the
+    Basic Multilingual Plane need their text to convert columns, so only those are kept.
+    Positions past the end of a line or document are clamped to it.
+    """
+
+    def __init__(self, text: str) -> None:
+        self.size = len(text)
+        self.line_starts = [0]
+        self.line_starts.extend(m.end() for m in _newline.finditer(text))
+        self._astral_lines = {}  # type: Dict[int, str]
+        for m in _astral.finditer(text):
+            line = bisect_right(self.line_starts, m.start()) - 1
+            if line not in self._astral_lines:
+                self._astral_lines[line] = text[self.line_starts[line]:self._line_end(line)]
+
+    def line_count(self) -> int:
+        return len(self.line_starts)
+
+    def _line_end(self, line: int) -> int:
+        if line + 1 < len(self.line_starts):
+            return self.line_starts[line + 1] - 1
+        return self.size
+
+    def offset(self, line: int, character: int) -> int:
+        if line >= len(self.line_starts):
+            return self.size
+        if line < 0:
+            return 0
+        start = self.line_starts[line]
+        astral_line = self._astral_lines.get(line)
+        if astral_line is not None:
+            return start + utf16_to_offset(astral_line, character)
+        return min(start + max(character, 0), self._line_end(line))
+
+    def position(self, offset: int) -> 'Tuple[int, int]':
+        offset = min(max(offset, 0), self.size)
+        line = bisect_right(self.line_starts, offset) - 1
+        column = offset - self.line_starts[line]
+        astral_line = self._astral_lines.get(line)
+        if astral_line is not None:
+            column = offset_to_utf16(astral_line, column)
+        return line, column
+
+    def point_to_offset(self, point: Point) -> int:
+        return self.offset(point.row, point.col)
+
+    def offset_to_point(self, offset: int) -> Point:
+        return Point(*self.position(offset))
+
+    def range_to_offsets(self, range: Range) -> 'Tuple[int, int]':
+        return self.offset(range.start.row, range.start.col), self.offset(range.end.row, range.end.col)
+
+    def ranges_to_offsets(self, ranges: 'Iterable[Range]') -> 'List[Tuple[int, int]]':
+        offset = self.offset
+        return [(offset(r.start.row, r.start.col), offset(r.end.row, r.end.col)) for r in ranges]
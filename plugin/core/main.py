@@ -11,6 +11,7 @@ from .settings import (
     settings, load_settings, unload_settings
 )
 from .logging import set_debug_logging
+from .eventloop import set_event_loop_enabled
 from .events import global_events
 from .registry import windows, load_handlers, unload_sessions
 from .panels import destroy_output_panels
@@ -19,6 +20,7 @@ from .panels import destroy_output_panels
 def startup():
     load_settings()
     set_debug_logging(settings.log_debug)
+    set_event_loop_enabled(settings.transport_event_loop)
     load_handlers()
     global_events.subscribe("view.on_load_async", on_view_activated)
     global_events.subscribe("view.on_activated_async", on_view_activated)
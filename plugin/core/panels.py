@@ -54,3 +54,14 @@ class LspUpdatePanelCommand(sublime_plugin.TextCommand):
         selection = self.view.sel()
         selection.clear()
         selection.add(sublime.Region(self.view.size(), self.view.size()))
+
+
+class LspReplacePanelRegionsCommand(sublime_plugin.TextCommand):
+    """
+    A replace_panel_regions command to replace parts of a panel's text, leaving the rest as is.
+    Each [begin, end, characters] replacement applies to the text the ones before it left.
+    """
+
+    def run(self, edit, replacements=()):
+        for begin, end, characters in replacements:
+            self.view.replace(edit, sublime.Region(begin, end), characters)
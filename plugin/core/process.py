@@ -1,6 +1,8 @@
 from .logging import debug, exception_log, server_log
+from .eventloop import event_loop, event_loop_enabled, set_non_blocking
 import subprocess
 import os
+import re
 import threading
 
 try:
@@ -33,11 +35,24 @@ def start_server(server_binary_args: 'List[str]', working_dir: str,
         return None
 
 
-def attach_logger(process: 'subprocess.Popen', stream) -> None:
-    threading.Thread(target=log_stream, args=(process, stream)).start()
+def attach_logger(process: 'subprocess.Popen', stream, log: bool = True,
+                  ready_pattern: 'Optional[str]' = None) -> threading.Event:
+    """
+    Drains stream, logging its lines if log is True.
+
+    The returned event is set once a line matches ready_pattern, or when the stream ends.
+    """
+    ready = threading.Event()
+    pattern = re.compile(ready_pattern) if ready_pattern else None
+    if event_loop_enabled():
+        StreamLogger(stream.fileno(), log, pattern, ready).start()
+    else:
+        threading.Thread(target=log_stream, args=(process, stream, log, pattern, ready)).start()
+    return ready
 
 
-def log_stream(process: 'subprocess.Popen', stream) -> None:
+def log_stream(process: 'subprocess.Popen', stream, log: bool = True, pattern: 'Any' = None,
+               ready: 'Optional[threading.Event]' = None) -> None:
     """
     Reads any errors from the LSP process.
     """
@@ -53,9 +68,66 @@ def log_stream(process: 'subprocess.Popen', stream) -> None:
                 decoded = content.decode("UTF-8")
             except UnicodeDecodeError:
                 decoded = content
-            server_log(decoded.strip())
+            if log:
+                server_log(decoded.strip())
+            if pattern and ready and not ready.is_set() and pattern.search(str(decoded)):
+                ready.set()
         except IOError as err:
             exception_log("Failure reading stream", err)
-            return
+            break
 
+    if ready:
+        ready.set()
     debug("LSP stream logger stopped.")
+
+
+class StreamLogger(object):
+    """
+    Logs the lines of an LSP process stream as they become readable on the event loop.
+    """
+
+    def __init__(self, fd: int, log: bool = True, pattern: 'Any' = None,
+                 ready: 'Optional[threading.Event]' = None) -> None:
+        self.fd = fd
+        self.log_lines = log
+        self.pattern = pattern
+        self.ready = ready
+        self.partial = b""
+
+    def start(self) -> None:
+        set_non_blocking(self.fd)
+        event_loop.add_reader(self.fd, self.on_readable)
+
+    def on_readable(self) -> None:
+        try:
+            content = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError as err:
+            exception_log("Failure reading stream", err)
+            self.stop()
+            return
+
+        if not content:
+            if self.partial:
+                self.log(self.partial)
+            self.stop()
+            return
+
+        lines = (self.partial + content).split(b"\n")
+        self.partial = lines.pop()
+        for line in lines:
+            self.log(line)
+
+    def log(self, line: bytes) -> None:
+        decoded = line.decode("UTF-8", "replace")
+        if self.log_lines:
+            server_log(decoded.strip())
+        if self.pattern and self.ready and not self.ready.is_set() and self.pattern.search(decoded):
+            self.ready.set()
+
+    def stop(self) -> None:
+        event_loop.remove_reader(self.fd)
+        if self.ready:
+            self.ready.set()
+        debug("LSP stream logger stopped.")
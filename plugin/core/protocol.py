@@ -11,6 +11,17 @@ TextDocumentSyncKindFull = 1
 TextDocumentSyncKindIncremental = 2
 
 
+class ErrorCodes(object):
+    ParseError = -32700
+    InvalidRequest = -32600
+    MethodNotFound = -32601
+    InvalidParams = -32602
+    InternalError = -32603
+    RequestCancelled = -32800
+    # not sent by servers: reported by the client for requests it stopped waiting for.
+    RequestTimedOut = -32099
+
+
 class DiagnosticSeverity(object):
     Error = 1
     Warning = 2
@@ -183,6 +194,10 @@ class Notification:
     def didChangeConfiguration(cls, params: dict) -> 'Notification':
         return Notification("workspace/didChangeConfiguration", params)
 
+    @classmethod
+    def cancelRequest(cls, params: dict) -> 'Notification':
+        return Notification("$/cancelRequest", params)
+
     @classmethod
     def exit(cls) -> 'Notification':
         return Notification("exit")
@@ -202,6 +217,8 @@ class Notification:
 
 
 class Point(object):
+    __slots__ = ('row', 'col')
+
     def __init__(self, row: int, col: int) -> None:
         self.row = int(row)
         self.col = int(col)
@@ -221,6 +238,8 @@ class Point(object):
 
 
 class Range(object):
+    __slots__ = ('start', 'end')
+
     def __init__(self, start: Point, end: Point) -> None:
         self.start = start
         self.end = end
@@ -239,26 +258,59 @@ class Range(object):
         return r
 
 
+# Diagnostic keys kept in their own attributes, the rest are kept as they were received.
+_diagnostic_keys = frozenset(('message', 'range', 'severity', 'source', 'code'))
+
+
 class Diagnostic(object):
-    def __init__(self, message: str, range: Range, severity: int,
-                 source: 'Optional[str]', lsp_diagnostic: dict) -> None:
+    """
+    A diagnostic, without its LSP dict: to_lsp rebuilds an equal dict when one is needed.
+    Many of these can be kept for a workspace, so they are slotted.
+    """
+    __slots__ = ('message', 'range', 'severity', 'source', 'code', '_has_severity', '_extras')
+
+    def __init__(self, message: str, range: Range, severity: 'Optional[int]',
+                 source: 'Optional[str]', code: 'Any' = None, extras: 'Optional[dict]' = None) -> None:
         self.message = message
         self.range = range
-        self.severity = severity
+        self._has_severity = severity is not None
+        self.severity = DiagnosticSeverity.Error if severity is None else severity
         self.source = source
-        self._lsp_diagnostic = lsp_diagnostic
+        self.code = code
+        # other keys, such as relatedInformation, or None if there are none.
+        self._extras = extras or None
 
     @classmethod
     def from_lsp(cls, lsp_diagnostic: dict) -> 'Diagnostic':
+        extras = None
+        if len(lsp_diagnostic) > 2 and not _diagnostic_keys.issuperset(lsp_diagnostic):
+            extras = {k: v for k, v in lsp_diagnostic.items() if k not in _diagnostic_keys}
         return Diagnostic(
             # crucial keys
             lsp_diagnostic['message'],
             Range.from_lsp(lsp_diagnostic['range']),
             # optional keys
-            lsp_diagnostic.get('severity', DiagnosticSeverity.Error),
+            lsp_diagnostic.get('severity'),
             lsp_diagnostic.get('source'),
-            lsp_diagnostic
+            lsp_diagnostic.get('code'),
+            extras
         )
 
-    def to_lsp(self)-> dict:
-        return self._lsp_diagnostic
+    @classmethod
+    def from_lsp_list(cls, lsp_diagnostics: 'List[dict]') -> 'List[Diagnostic]':
+        from_lsp = cls.from_lsp
+        return [from_lsp(lsp_diagnostic) for lsp_diagnostic in lsp_diagnostics]
+
+    def to_lsp(self) -> dict:
+        r = OrderedDict()  # type: OrderedDict[str, Any]
+        r['message'] = self.message
+        r['range'] = self.range.to_lsp()
+        if self._has_severity:
+            r['severity'] = self.severity
+        if self.source is not None:
+            r['source'] = self.source
+        if self.code is not None:
+            r['code'] = self.code
+        if self._extras:
+            r.update(self._extras)
+        return r
@@ -8,7 +8,7 @@ from .configurations import (
 from .clients import (
     start_window_config
 )
-from .types import ClientStates, ClientConfig
+from .types import ClientConfig
 from .handlers import LanguageHandler
 from .logging import debug
 from .sessions import Session
@@ -68,16 +68,7 @@ def _session_for_view_and_window(view: sublime.View, window: 'Optional[sublime.W
         debug("no window for view", view.file_name())
         return None
 
-    config = config_for_scope(view, point)
-    if not config:
-        debug("config not available for view", view.file_name())
-        return None
-
-    session = windows.lookup(window).get_session(config.name)
-    if session:
-        if session.state == ClientStates.READY:
-            return session
-    return None
+    return windows.lookup(window).session_for_view(view, point)
 
 
 def _client_for_view_and_window(view: sublime.View, window: 'Optional[sublime.Window]') -> 'Optional[Client]':
@@ -108,7 +99,8 @@ handlers_dispatcher = LanguageHandlerDispatcher()
 windows = WindowRegistry(configs, documents, diagnostics, start_window_config, sublime, handlers_dispatcher)
 
 
-def config_for_scope(view: 'Any', point=None) -> 'Optional[ClientConfig]':
+def scope_config(view: 'Any', point=None) -> 'Optional[ClientConfig]':
+    """The config for the scope, whether or not the view's document was opened in its session."""
     window = view.window()
     if window:
         # todo: don't expose _configs
@@ -116,6 +108,15 @@ def config_for_scope(view: 'Any', point=None) -> 'Optional[ClientConfig]':
     return None
 
 
+def config_for_scope(view: 'Any', point=None) -> 'Optional[ClientConfig]':
+    """The config for the scope, if the view's document was opened in its session."""
+    config = scope_config(view, point)
+    window = view.window()
+    if config and window and windows.lookup(window).is_document_open(view, config.name):
+        return config
+    return None
+
+
 def is_supported_view(view: sublime.View) -> bool:
     # TODO: perhaps make this check for a client instead of a config
     if config_for_scope(view):
@@ -138,9 +139,29 @@ class LspTextCommand(sublime_plugin.TextCommand):
         return False
 
 
+class LspShowDocumentSyncDebounceCommand(sublime_plugin.WindowCommand):
+    """Lists the open views with the delay last chosen before sending their changes."""
+
+    def run(self):
+        debounce_windows = windows.lookup(self.window).debounce_windows()
+        self._views = [view for view in self.window.views() if view.buffer_id() in debounce_windows]
+        if not self._views:
+            self.window.status_message("No changes sent yet")
+            return
+        items = [[view.file_name() or view.name(),
+                  "didChange debounce: {:.0f} ms".format(debounce_windows[view.buffer_id()] * 1000)]
+                 for view in self._views]
+        self.window.show_quick_panel(items, self._on_done)
+
+    def _on_done(self, index):
+        if index > -1:
+            self.window.focus_view(self._views[index])
+
+
 class LspRestartClientCommand(sublime_plugin.TextCommand):
     def is_enabled(self):
-        return is_supported_view(self.view)
+        # also restarts servers that crashed, or never got the document
+        return scope_config(self.view) is not None
 
     def run(self, edit):
         window = self.view.window()
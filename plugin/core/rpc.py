@@ -1,8 +1,13 @@
-import json
-import socket
+import re
+import threading
 import time
-from .transports import TCPTransport, StdioTransport, Transport
+from collections import OrderedDict
+from concurrent.futures import Future
+from .transports import connect_tcp, create_tcp_transport, create_stdio_transport, Transport
+from .transports import PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BULK
 from .process import attach_logger
+from .dispatch import InlineDispatcher, notification_dispatcher
+from .codec import JsonCodec, default_codec
 try:
     import subprocess
     from typing import Any, List, Dict, Tuple, Callable, Optional, Union
@@ -12,53 +17,93 @@ except ImportError:
     pass
 
 from .logging import debug, exception_log, server_log
-from .protocol import Request, Notification
+from .protocol import Request, Notification, ErrorCodes
 from .types import Settings
 
 
-TCP_CONNECT_TIMEOUT = 5
+# Seconds to wait for a response before a request is failed and forgotten.
+# None disables the timeout, for requests servers may legitimately take very long on.
+DEFAULT_REQUEST_TIMEOUT = 30
+REQUEST_TIMEOUTS = {
+    "initialize": None,
+    "shutdown": None,
+    "textDocument/hover": 10,
+    "textDocument/completion": 10,
+    "textDocument/signatureHelp": 10,
+    "textDocument/documentHighlight": 10,
+    "completionItem/resolve": 10,
+}  # type: Dict[str, Optional[float]]
+
+# Messages the user is waiting on, and the document changes they depend on, are sent
+# ahead of everything else; document opens and workspace traffic go last.
+INTERACTIVE_METHODS = {
+    "textDocument/didChange",
+    "textDocument/completion",
+    "textDocument/signatureHelp",
+    "completionItem/resolve",
+}
+BULK_METHODS = {
+    "textDocument/didOpen",
+    "workspace/didChangeConfiguration",
+    "workspace/didChangeWatchedFiles",
+    "workspace/didChangeWorkspaceFolders",
+    "shutdown",
+    "exit",
+}
+
+# Number of cancelled request ids remembered for dropping their late responses.
+CANCELLED_REQUESTS_LIMIT = 1000
+
+# Top-level "id" of a response, either as its first key (optionally after "jsonrpc")
+# or as its last key. Nested ids can not match these as the patterns are anchored.
+_RESPONSE_ID_HEAD = re.compile(r'\s*\{\s*(?:"jsonrpc"\s*:\s*"2\.0"\s*,\s*)?"id"\s*:\s*"?(\d+)"?\s*,')
+_RESPONSE_ID_TAIL = re.compile(r',\s*"id"\s*:\s*"?(\d+)"?\s*\}\s*$')
 
 # RequestDict = TypedDict('RequestDict', {'id': 'Union[str,int]', 'method': str, 'params': 'Optional[Any]'})
 
 
-def format_request(payload: 'Dict[str, Any]') -> str:
-    """Converts the request into json and adds the Content-Length header"""
-    content = json.dumps(payload, sort_keys=False)
-    content_length = len(content)
-    result = "Content-Length: {}\r\n\r\n{}".format(content_length, content)
-    return result
+def format_request(payload: 'Dict[str, Any]', codec: JsonCodec = default_codec) -> bytes:
+    """Converts the request into UTF-8 encoded json and adds the Content-Length header"""
+    content = codec.encode(payload)
+    header = "Content-Length: {}\r\n\r\n".format(len(content)).encode("ascii")
+    return header + content
+
+
+def peek_response_id(message: str) -> 'Optional[int]':
+    """
+    Finds the id of a response without decoding it, if it can be found cheaply.
+
+    Server requests can have their "method" after long params, so any message with a "method"
+    key anywhere is left to be decoded, even if it is a response with such a key in its result.
+    """
+    if '"method"' in message:
+        return None  # possibly a request or notification from the server
+    match = _RESPONSE_ID_HEAD.match(message[:128]) or _RESPONSE_ID_TAIL.search(message[-64:])
+    return int(match.group(1)) if match else None
 
 
 def attach_tcp_client(tcp_port: int, process: 'subprocess.Popen', settings: Settings) -> 'Optional[Client]':
     if settings.log_stderr:
         attach_logger(process, process.stdout)
 
-    host = "localhost"
-    start_time = time.time()
-    debug('connecting to {}:{}'.format(host, tcp_port))
-
-    while time.time() - start_time < TCP_CONNECT_TIMEOUT:
-        try:
-            sock = socket.create_connection((host, tcp_port))
-            transport = TCPTransport(sock)
-
-            client = Client(transport, settings)
-            client.set_transport_failure_handler(lambda: try_terminate_process(process))
-            return client
-        except ConnectionRefusedError as e:
-            pass
+    try:
+        sock = connect_tcp(tcp_port)
+    except Exception:
+        process.kill()
+        raise
 
-    process.kill()
-    raise Exception("Timeout connecting to socket")
+    client = Client(create_tcp_transport(sock), settings, notification_dispatcher)
+    client.set_transport_failure_handler(lambda: try_terminate_process(process))
+    return client
 
 
 def attach_stdio_client(process: 'subprocess.Popen', settings: Settings) -> 'Client':
-    transport = StdioTransport(process)
+    transport = create_stdio_transport(process)
 
     # TODO: process owner can take care of this outside client?
     if settings.log_stderr:
         attach_logger(process, process.stderr)
-    client = Client(transport, settings)
+    client = Client(transport, settings, notification_dispatcher)
     client.set_transport_failure_handler(lambda: try_terminate_process(process))
     return client
 
@@ -70,13 +115,170 @@ def try_terminate_process(process: 'subprocess.Popen') -> None:
         pass  # process can be terminated already
 
 
+class ResponseError(Exception):
+    def __init__(self, error: 'Dict[str, Any]') -> None:
+        super().__init__(error.get("message"))
+        self.error = error
+
+
+class RequestTimeout(Exception):
+    pass
+
+
+class PendingRequest(object):
+    def __init__(self, request_id: int, method: str, handler: 'Optional[Callable]',
+                 error_handler: 'Optional[Callable]', timeout: 'Optional[float]',
+                 supersede_key: 'Optional[Any]' = None) -> None:
+        self.request_id = request_id
+        self.method = method
+        self.supersede_key = supersede_key
+        self.handler = handler
+        self.error_handler = error_handler
+        self.future = Future()  # type: Future
+        self.sent_at = time.time()
+        self.deadline = self.sent_at + timeout if timeout is not None else None
+        # the encoded request and how it was queued, to withdraw it or queue its cancel behind it.
+        self.message = None  # type: Optional[bytes]
+        self.priority = PRIORITY_NORMAL
+        self.key = None  # type: Optional[str]
+
+
+class PendingRequests(object):
+    """
+    Keeps the handlers of requests awaiting a response.
+
+    Entries are removed when the response arrives or when the request times out,
+    so closures registered for unanswered requests do not accumulate. Also keeps which
+    request each supersede key belongs to, and the ids of cancelled requests whose responses
+    are dropped. Requests are sent, answered and expired on different threads, so all of it
+    is guarded by one lock.
+    """
+
+    def __init__(self) -> None:
+        self._requests = {}  # type: Dict[int, PendingRequest]
+        self._superseding = {}  # type: Dict[Any, int]
+        self._cancelled = OrderedDict()  # type: OrderedDict[int, str]
+        self._lock = threading.Lock()
+
+    def add(self, pending: PendingRequest) -> None:
+        with self._lock:
+            self._requests[pending.request_id] = pending
+
+    def pop(self, request_id: int) -> 'Optional[PendingRequest]':
+        with self._lock:
+            return self._requests.pop(request_id, None)
+
+    def pop_expired(self, now: float) -> 'List[PendingRequest]':
+        with self._lock:
+            expired = [pending for pending in self._requests.values()
+                       if pending.deadline is not None and pending.deadline <= now]
+            for pending in expired:
+                del self._requests[pending.request_id]
+            return expired
+
+    def next_deadline(self) -> 'Optional[float]':
+        with self._lock:
+            deadlines = [pending.deadline for pending in self._requests.values() if pending.deadline is not None]
+        return min(deadlines) if deadlines else None
+
+    def pop_all(self) -> 'List[PendingRequest]':
+        with self._lock:
+            pending_requests = list(self._requests.values())
+            self._requests.clear()
+            return pending_requests
+
+    def __len__(self) -> int:
+        return len(self._requests)
+
+    def supersede(self, pending: PendingRequest) -> 'Optional[int]':
+        """Makes a request the latest of its supersede key, returning the id of the one it replaces."""
+        with self._lock:
+            superseded_id = self._superseding.get(pending.supersede_key)
+            self._superseding[pending.supersede_key] = pending.request_id
+            return superseded_id
+
+    def forget_superseding(self, pending: PendingRequest) -> None:
+        if pending.supersede_key is None:
+            return
+        with self._lock:
+            if self._superseding.get(pending.supersede_key) == pending.request_id:
+                del self._superseding[pending.supersede_key]
+
+    def add_cancelled(self, pending: PendingRequest) -> None:
+        with self._lock:
+            self._cancelled[pending.request_id] = pending.method
+            while len(self._cancelled) > CANCELLED_REQUESTS_LIMIT:
+                self._cancelled.popitem(last=False)
+
+    def has_cancelled(self) -> bool:
+        return bool(self._cancelled)
+
+    def pop_cancelled(self, request_id: int) -> bool:
+        """Forgets a cancelled request, returning whether it was one."""
+        with self._lock:
+            return self._cancelled.pop(request_id, None) is not None
+
+    def stats(self, now: 'Optional[float]' = None) -> 'Dict[str, Any]':
+        """In-flight request count, age of the oldest request and counts per method."""
+        now = now or time.time()
+        with self._lock:
+            pending_requests = list(self._requests.values())
+        by_method = {}  # type: Dict[str, int]
+        for pending in pending_requests:
+            by_method[pending.method] = by_method.get(pending.method, 0) + 1
+        oldest = min([now] + [pending.sent_at for pending in pending_requests])
+        return {
+            "in_flight": len(pending_requests),
+            "oldest_age": now - oldest,
+            "by_method": by_method
+        }
+
+
+def document_uri(payload: 'Dict[str, Any]') -> 'Optional[str]':
+    """The uri of the document a message is about, if any."""
+    params = payload.get("params")
+    if isinstance(params, dict):
+        uri = params.get("uri")
+        if uri is None:
+            text_document = params.get("textDocument")
+            if isinstance(text_document, dict):
+                uri = text_document.get("uri")
+        if isinstance(uri, str):
+            return uri
+    return None
+
+
+def dispatch_key(payload: 'Dict[str, Any]') -> str:
+    """Server messages about the same document are handled in order; others are ordered by method."""
+    return document_uri(payload) or payload.get("method", "")
+
+
+def message_priority(payload: 'Dict[str, Any]') -> int:
+    method = payload.get("method")
+    if method in INTERACTIVE_METHODS:
+        return PRIORITY_INTERACTIVE
+    elif method in BULK_METHODS:
+        return PRIORITY_BULK
+    return PRIORITY_NORMAL
+
+
 class Client(object):
-    def __init__(self, transport: Transport, settings) -> None:
+    def __init__(self, transport: Transport, settings, dispatcher: 'Any' = None,
+                 codec: JsonCodec = default_codec) -> None:
+        """
+        Responses are handled on the transport's thread as soon as they are decoded. Server
+        notifications and requests are handed to the dispatcher, which handles them inline
+        unless a worker pool is given, so a slow handler does not hold up later responses.
+
+        Messages are encoded and decoded with codec, the fastest JSON implementation available
+        by default.
+        """
+        self._dispatcher = dispatcher or InlineDispatcher()
+        self._codec = codec
         self.transport = transport
         self.transport.start(self.receive_payload, self.on_transport_closed)
         self.request_id = 0
-        self._response_handlers = {}  # type: Dict[int, Callable]
-        self._error_handlers = {}  # type: Dict[int, Callable]
+        self._pending_requests = PendingRequests()
         self._request_handlers = {}  # type: Dict[str, Callable]
         self._notification_handlers = {}  # type: Dict[str, Callable]
         self.exiting = False
@@ -84,16 +286,121 @@ class Client(object):
         self._transport_fail_handler = None  # type: Optional[Callable]
         self._error_display_handler = lambda msg: debug(msg)
         self.settings = settings
+        # expires requests at the earliest deadline, so they time out while the client is idle too.
+        self._expiry_timer = None  # type: Optional[threading.Timer]
+        self._expiry_deadline = None  # type: Optional[float]
+        self._expiry_lock = threading.Lock()
 
     def send_request(self, request: Request, handler: 'Callable[[Optional[Any]], None]',
-                     error_handler: 'Optional[Callable]' = None) -> None:
+                     error_handler: 'Optional[Callable]' = None, supersede_key: 'Optional[Any]' = None) -> Future:
+        """
+        Sends a request, returning a future that resolves with the response's result.
+
+        Requests sent with the same supersede_key (for example a view id) replace each other:
+        an earlier request of the same method and key still in flight is cancelled.
+        Cancelling the returned future cancels the request.
+        """
         self.request_id += 1
+        request_id = self.request_id
         debug(' --> ' + request.method)
-        if handler is not None:
-            self._response_handlers[self.request_id] = handler
-        if error_handler is not None:
-            self._error_handlers[self.request_id] = error_handler
-        self.send_payload(request.to_payload(self.request_id))
+        timeout = REQUEST_TIMEOUTS.get(request.method, DEFAULT_REQUEST_TIMEOUT)
+        key = (request.method, supersede_key) if supersede_key is not None else None
+        pending = PendingRequest(request_id, request.method, handler, error_handler, timeout, key)
+        if key is not None:
+            superseded_id = self._pending_requests.supersede(pending)
+            if superseded_id is not None:
+                self.cancel_request(superseded_id)
+        self._pending_requests.add(pending)
+        if pending.deadline is not None:
+            self._schedule_expiry(pending.deadline)
+        pending.future.add_done_callback(lambda future: self._on_request_done(request_id, future))
+        payload = request.to_payload(request_id)
+        pending.priority = message_priority(payload)
+        pending.key = document_uri(payload)
+        pending.message = self.send_payload(payload, pending.priority, pending.key)
+        return pending.future
+
+    def cancel_request(self, request_id: int) -> None:
+        """
+        Takes back a request that is still queued, or else asks the server to stop working on it
+        and drops its response when it arrives.
+        """
+        pending = self._pending_requests.pop(request_id)
+        if pending is None:
+            return
+        self._pending_requests.forget_superseding(pending)
+        self._withdraw_or_cancel(pending)
+        pending.future.cancel()
+
+    def _withdraw_or_cancel(self, pending: PendingRequest) -> None:
+        if pending.message is not None and self.transport.withdraw(pending.message):
+            debug(' -x- ' + pending.method)
+        else:
+            self._pending_requests.add_cancelled(pending)
+            debug(' --> $/cancelRequest ' + pending.method)
+            # queued like the request, so the cancel can not overtake it.
+            self.send_payload(Notification.cancelRequest({"id": pending.request_id}).to_payload(),
+                              pending.priority, pending.key)
+
+    def _on_request_done(self, request_id: int, future: Future) -> None:
+        if future.cancelled():
+            self.cancel_request(request_id)
+
+    def _complete(self, pending: 'Optional[PendingRequest]') -> 'Optional[PendingRequest]':
+        """Claims a request for completion, unless its future was cancelled in the meantime."""
+        if pending is None:
+            return None
+        self._pending_requests.forget_superseding(pending)
+        if not pending.future.set_running_or_notify_cancel():
+            return None
+        return pending
+
+    def expire_requests(self) -> None:
+        """
+        Fails and forgets requests that have outlived their method's timeout, and cancels them
+        so the server stops working on them and their late responses are dropped.
+        """
+        for expired in self._pending_requests.pop_expired(time.time()):
+            self._withdraw_or_cancel(expired)
+            pending = self._complete(expired)
+            if not pending:
+                continue
+            message = "{} timed out after {:.0f}s".format(pending.method, time.time() - pending.sent_at)
+            stats = self.pending_requests_stats()
+            debug("{} ({} requests in flight, oldest sent {:.0f}s ago)".format(
+                message, stats["in_flight"], stats["oldest_age"]))
+            if pending.error_handler is not None:
+                self._call_handler(pending.error_handler, {"code": ErrorCodes.RequestTimedOut, "message": message})
+            pending.future.set_exception(RequestTimeout(message))
+
+    def _schedule_expiry(self, deadline: float) -> None:
+        with self._expiry_lock:
+            if self._expiry_deadline is not None and self._expiry_deadline <= deadline:
+                return
+            if self._expiry_timer is not None:
+                self._expiry_timer.cancel()
+            timer = threading.Timer(max(deadline - time.time(), 0), self._on_expiry_timer)
+            timer.daemon = True
+            self._expiry_timer = timer
+            self._expiry_deadline = deadline
+            timer.start()
+
+    def _cancel_expiry(self) -> None:
+        with self._expiry_lock:
+            if self._expiry_timer is not None:
+                self._expiry_timer.cancel()
+            self._expiry_timer = None
+            self._expiry_deadline = None
+
+    def _on_expiry_timer(self) -> None:
+        self._cancel_expiry()
+        self.expire_requests()
+        deadline = self._pending_requests.next_deadline()
+        if deadline is not None:
+            self._schedule_expiry(deadline)
+
+    def pending_requests_stats(self) -> 'Dict[str, Any]':
+        return self._pending_requests.stats()
 
     def send_notification(self, notification: Notification) -> None:
         debug(' --> ' + notification.method)
@@ -118,26 +425,40 @@ class Client(object):
         if self._crash_handler is not None:
             self._crash_handler()
 
-    def send_payload(self, payload: 'Dict[str, Any]') -> None:
-        message = format_request(payload)
-        self.transport.send(message)
+    def send_payload(self, payload: 'Dict[str, Any]', priority: 'Optional[int]' = None,
+                     key: 'Optional[str]' = None) -> bytes:
+        """Queues a message, by default with the priority and key of its method and document."""
+        message = format_request(payload, self._codec)
+        if priority is None:
+            priority = message_priority(payload)
+            key = document_uri(payload)
+        self.transport.send(message, priority, key)
+        return message
 
     def receive_payload(self, message: str) -> None:
+        if self._pending_requests.has_cancelled():
+            response_id = peek_response_id(message)
+            if response_id is not None and self._pending_requests.pop_cancelled(response_id):
+                debug('dropped response to cancelled request', response_id)
+                return
+
         payload = None
         try:
-            payload = json.loads(message)
+            payload = self._codec.decode(message)
             # limit = min(len(message), 200)
             # debug("got json: ", message[0:limit], "...")
-        except IOError as err:
+        except ValueError as err:
             exception_log("got a non-JSON payload: " + message, err)
             return
 
         try:
             if "method" in payload:
                 if "id" in payload:
-                    self.request_handler(payload)
+                    self._dispatcher.dispatch((id(self), dispatch_key(payload)),
+                                              lambda: self.request_handler(payload))
                 else:
-                    self.notification_handler(payload)
+                    self._dispatcher.dispatch((id(self), dispatch_key(payload)),
+                                              lambda: self.notification_handler(payload))
             elif "id" in payload:
                 self.response_handler(payload)
             else:
@@ -146,6 +467,10 @@ class Client(object):
             exception_log("Error handling server payload", err)
 
     def on_transport_closed(self) -> None:
+        self._cancel_expiry()
+        for pending in self._pending_requests.pop_all():
+            if self._complete(pending):
+                pending.future.set_exception(ResponseError({"message": "Communication to server closed"}))
         self._error_display_handler("Communication to server closed, exiting")
         # Differentiate between normal exit and server crash?
         if not self.exiting:
@@ -153,25 +478,38 @@ class Client(object):
 
     def response_handler(self, response: 'Dict[str, Any]') -> None:
         handler_id = int(response["id"])  # dotty sends strings back :(
+        pending = self._complete(self._pending_requests.pop(handler_id))
+        if not pending and self._pending_requests.pop_cancelled(handler_id):
+            return
         if 'result' in response and 'error' not in response:
             result = response['result']
             if self.settings.log_payloads:
                 debug('     ' + str(result))
-            if handler_id in self._response_handlers:
-                self._response_handlers[handler_id](result)
+            if pending:
+                if pending.handler is not None:
+                    self._call_handler(pending.handler, result)
+                pending.future.set_result(result)
             else:
                 debug("No handler found for id " + str(response.get("id")))
         elif 'error' in response and 'result' not in response:
             error = response['error']
             if self.settings.log_payloads:
                 debug('     ' + str(error))
-            if handler_id in self._error_handlers:
-                self._error_handlers[handler_id](error)
+            if pending and pending.error_handler is not None:
+                self._call_handler(pending.error_handler, error)
             else:
                 self._error_display_handler(error.get("message"))
+            if pending:
+                pending.future.set_exception(ResponseError(error))
         else:
             debug('invalid response payload', response)
 
+    def _call_handler(self, handler: 'Callable', value: 'Any') -> None:
+        try:
+            handler(value)
+        except Exception as err:
+            exception_log("Error handling server payload", err)
+
     def on_request(self, request_method: str, handler: 'Callable') -> None:
         self._request_handlers[request_method] = handler
 
@@ -0,0 +1,59 @@
+try:
+    from typing import Dict, List, Optional, Tuple
+    assert Dict and List and Optional and Tuple
+except ImportError:
+    pass
+
+
+class Sections(object):
+    """
+    Text made of keyed sections, in the order they were first set, that tracks where each
+    section is so a change to one can be applied as a single replacement.
+    """
+
+    def __init__(self) -> None:
+        self._keys = []  # type: List[str]
+        self._texts = {}  # type: Dict[str, str]
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._texts
+
+    def text(self) -> str:
+        return "".join(self._texts[key] for key in self._keys)
+
+    def offset(self, key: str) -> int:
+        offset = 0
+        for other in self._keys:
+            if other == key:
+                return offset
+            offset += len(self._texts[other])
+        return offset
+
+    def set(self, key: str, text: str) -> 'Optional[Tuple[int, int, str]]':
+        """
+        Sets or, given empty text, removes a section. Returns the replacement to make in the
+        previous text, as begin and end offsets and the new characters, or None if nothing changed.
+        """
+        previous = self._texts.get(key)
+        if previous == text or (previous is None and not text):
+            return None
+        begin = self.offset(key)
+        if previous is None:
+            self._keys.append(key)
+            previous = ""
+        if text:
+            self._texts[key] = text
+        else:
+            self._keys.remove(key)
+            del self._texts[key]
+        self.size += len(text) - len(previous)
+        return begin, begin + len(previous), text
+
+    def clear(self) -> None:
+        self._keys = []
+        self._texts = {}
+        self.size = 0
@@ -1,10 +1,13 @@
 from .types import ClientConfig, ClientStates, Settings
 from .protocol import Request
-from .transports import start_tcp_transport
+from .transports import start_tcp_transport, Transport
 from .rpc import Client, attach_stdio_client
-from .process import start_server
+from .process import start_server, attach_logger
+from .logging import debug
+from .dispatch import notification_dispatcher
 from .url import filename_to_uri
 import os
+import time
 from .protocol import CompletionItemKind, SymbolKind
 try:
     from typing import Callable, Dict, Any, Optional
@@ -22,9 +25,13 @@ def create_session(config: ClientConfig, project_path: str, env: dict, settings:
         process = start_server(config.binary_args, project_path, env)
         if process:
             if config.tcp_port:
-                transport = start_tcp_transport(config.tcp_port, config.tcp_host)
+                ready = None
+                if config.tcp_ready_pattern:
+                    ready = attach_logger(process, process.stdout, settings.log_stderr, config.tcp_ready_pattern)
+                transport = connect_session_transport(config, config.tcp_port, ready)
                 if transport:
-                    session = Session(config, project_path, Client(transport, settings), on_created, on_ended)
+                    client = Client(transport, settings, notification_dispatcher)
+                    session = Session(config, project_path, client, on_created, on_ended)
                 else:
                     # try to terminate the process
                     try:
@@ -36,9 +43,9 @@ def create_session(config: ClientConfig, project_path: str, env: dict, settings:
                 session = Session(config, project_path, client, on_created, on_ended)
     else:
         if config.tcp_port:
-            transport = start_tcp_transport(config.tcp_port)
+            transport = connect_session_transport(config, config.tcp_port)
 
-            session = Session(config, project_path, Client(transport, settings),
+            session = Session(config, project_path, Client(transport, settings, notification_dispatcher),
                               on_created, on_ended)
         elif bootstrap_client:
             session = Session(config, project_path, bootstrap_client,
@@ -49,6 +56,13 @@ def create_session(config: ClientConfig, project_path: str, env: dict, settings:
     return session
 
 
+def connect_session_transport(config: ClientConfig, port: int, ready=None) -> 'Transport':
+    start_time = time.time()
+    transport = start_tcp_transport(port, config.tcp_host, ready)
+    debug("{} connected in {:.0f} ms".format(config.name, (time.time() - start_time) * 1000))
+    return transport
+
+
 def get_initialize_params(project_path: str, config: ClientConfig):
     initializeParams = {
         "processId": os.getpid(),
@@ -1,6 +1,7 @@
 import sublime
 from .types import Settings, ClientConfig, LanguageConfig
 from .logging import debug
+from .largefile import LARGE_FILE_POLICIES
 
 PLUGIN_NAME = 'LSP'
 
@@ -51,6 +52,8 @@ def update_settings(settings: Settings, settings_obj: sublime.Settings):
                                                                        "show_diagnostics_count_in_view_status", False)
     settings.show_diagnostics_in_view_status = read_bool_setting(settings_obj, "show_diagnostics_in_view_status", True)
     settings.show_diagnostics_severity_level = read_int_setting(settings_obj, "show_diagnostics_severity_level", 3)
+    settings.diagnostics_max_per_file = read_int_setting(settings_obj, "diagnostics_max_per_file", 1000)
+    settings.diagnostics_max_per_window = read_int_setting(settings_obj, "diagnostics_max_per_window", 20000)
     settings.diagnostics_highlight_style = read_str_setting(settings_obj, "diagnostics_highlight_style", "underline")
     settings.highlight_active_signature_parameter = read_bool_setting(settings_obj,
                                                                       "highlight_active_signature_parameter", True)
@@ -63,6 +66,15 @@ def update_settings(settings: Settings, settings_obj: sublime.Settings):
     settings.completion_hint_type = read_str_setting(settings_obj, "completion_hint_type", "auto")
     settings.complete_using_text_edit = read_bool_setting(settings_obj, "complete_using_text_edit", False)
     settings.resolve_completion_for_snippets = read_bool_setting(settings_obj, "resolve_completion_for_snippets", False)
+    settings.document_sync_debounce_min = read_int_setting(settings_obj, "document_sync_debounce_min", 100)
+    settings.document_sync_debounce_max = read_int_setting(settings_obj, "document_sync_debounce_max", 1000)
+    settings.large_file_size = read_int_setting(settings_obj, "large_file_size", 5000000)
+    settings.large_file_line_length = read_int_setting(settings_obj, "large_file_line_length", 20000)
+    settings.large_file_policy = read_str_setting(settings_obj, "large_file_policy", "read_only")
+    if settings.large_file_policy not in LARGE_FILE_POLICIES:
+        settings.large_file_policy = "read_only"
+    settings.lazy_background_documents = read_bool_setting(settings_obj, "lazy_background_documents", False)
+    settings.transport_event_loop = read_bool_setting(settings_obj, "transport_event_loop", False)
     settings.log_debug = read_bool_setting(settings_obj, "log_debug", False)
     settings.log_server = read_bool_setting(settings_obj, "log_server", True)
     settings.log_stderr = read_bool_setting(settings_obj, "log_stderr", False)
@@ -163,7 +175,8 @@ def read_client_config(name: str, client_config: 'Dict') -> ClientConfig:
         client_config.get("initializationOptions", dict()),
         client_config.get("settings", dict()),
         client_config.get("env", dict()),
-        client_config.get("tcp_host", None)
+        client_config.get("tcp_host", None),
+        client_config.get("tcp_ready_pattern", None)
     )
 
 
@@ -181,5 +194,6 @@ def update_client_config(config: 'ClientConfig', settings: dict) -> 'ClientConfi
         settings.get("init_options", config.init_options),
         settings.get("settings", config.settings),
         settings.get("env", config.env),
-        settings.get("tcp_host", config.tcp_host)
+        settings.get("tcp_host", config.tcp_host),
+        settings.get("tcp_ready_pattern", config.tcp_ready_pattern)
     )
@@ -0,0 +1,85 @@
+from .protocol import TextDocumentSyncKindNone, TextDocumentSyncKindIncremental
+
+try:
+    from typing import Any, Dict, Optional, Tuple
+    assert Any and Dict and Optional and Tuple
+except ImportError:
+    pass
+
+
+def content_fingerprint(text: str) -> 'Tuple[int, int]':
+    """Identifies a document's content without keeping a copy of it."""
+    return len(text), hash(text)
+
+
+def text_sync_kind(capabilities: 'Dict[str, Any]') -> int:
+    """The textDocumentSync kind of a server, which can be given as a number or as TextDocumentSyncOptions."""
+    sync = capabilities.get("textDocumentSync")
+    if isinstance(sync, dict):
+        sync = sync.get("change")
+    if isinstance(sync, int) and not isinstance(sync, bool):
+        return sync
+    return TextDocumentSyncKindNone
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    """
+    Length of the longest common prefix of a and b.
+
+    Binary search on slice compares, so the characters are compared in C rather than one
+    at a time in Python.
+    """
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix_length(a: str, b: str, limit: int) -> int:
+    """Length of the longest common suffix of a and b, up to limit characters."""
+    low, high = 0, min(len(a), len(b), limit)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:len(a) - low] == b[len(b) - middle:len(b) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def offset_to_position(text: str, offset: int) -> 'Dict[str, int]':
+    """LSP position of a character offset, with the character counted in UTF-16 code units."""
+    line_start = text.rfind("\n", 0, offset) + 1
+    line_prefix = text[line_start:offset]
+    return {
+        "line": text.count("\n", 0, line_start),
+        "character": len(line_prefix.encode("UTF-16-LE")) // 2
+    }
+
+
+def incremental_change(old: str, new: str) -> 'Dict[str, Any]':
+    """
+    A single TextDocumentContentChangeEvent replacing the part of old that differs from new.
+
+    Several edits between two syncs are merged into one change spanning all of them.
+    """
+    prefix = common_prefix_length(old, new)
+    suffix = common_suffix_length(old, new, min(len(old), len(new)) - prefix)
+    return {
+        "range": {
+            "start": offset_to_position(old, prefix),
+            "end": offset_to_position(old, len(old) - suffix)
+        },
+        "text": new[prefix:len(new) - suffix]
+    }
+
+
+def content_change(old: 'Optional[str]', new: str, sync_kind: int) -> 'Dict[str, Any]':
+    """The didChange content change to send for a server with the given sync kind."""
+    if sync_kind == TextDocumentSyncKindIncremental and old is not None:
+        return incremental_change(old, new)
+    return {"text": new}
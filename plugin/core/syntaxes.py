@@ -0,0 +1,86 @@
+import re
+from .types import ClientConfig, LanguageConfig
+
+try:
+    from typing import Any, Dict, List, Optional, Tuple
+    assert Any and Dict and List and Optional and Tuple and ClientConfig and LanguageConfig
+except ImportError:
+    pass
+
+
+# Compiled syntax patterns and their results, keyed by a language's syntaxes. Both are
+# bounded by the number of languages and syntaxes in use, so they are never cleared.
+_patterns = {}  # type: Dict[Tuple[str, ...], Any]
+_matches = {}  # type: Dict[Tuple[Tuple[str, ...], str], bool]
+
+
+def syntax_pattern(syntaxes: 'Tuple[str, ...]') -> 'Any':
+    pattern = _patterns.get(syntaxes)
+    if pattern is None:
+        pattern = re.compile(r'|'.join(r'\b%s\b' % re.escape(s) for s in syntaxes), re.IGNORECASE)
+        _patterns[syntaxes] = pattern
+    return pattern
+
+
+def language_supports_syntax(language: LanguageConfig, syntax: 'Optional[str]') -> bool:
+    if syntax is None:
+        return False
+    key = (tuple(language.syntaxes), syntax)
+    matched = _matches.get(key)
+    if matched is None:
+        matched = syntax_pattern(key[0]).search(syntax) is not None
+        _matches[key] = matched
+    return matched
+
+
+def syntax_language(config: ClientConfig, syntax: 'Optional[str]') -> 'Optional[LanguageConfig]':
+    for language in config.languages:
+        if language_supports_syntax(language, syntax):
+            return language
+    return None
+
+
+def config_supports_syntax(config: ClientConfig, syntax: 'Optional[str]') -> bool:
+    return syntax_language(config, syntax) is not None
+
+
+class SyntaxIndex(object):
+    """
+    The configs, and the language of each, that support a syntax, for a list of configs.
+
+    Lookups are memoized per syntax. The index is built for one list of configs; use
+    matches_configs to tell whether it is still current.
+    """
+
+    def __init__(self, configs: 'List[ClientConfig]') -> None:
+        self.configs = configs
+        self._size = len(configs)
+        self._languages = {}  # type: Dict[str, List[Tuple[ClientConfig, LanguageConfig]]]
+
+    def matches_configs(self, configs: 'List[ClientConfig]') -> bool:
+        return configs is self.configs and len(configs) == self._size
+
+    def languages(self, syntax: str) -> 'List[Tuple[ClientConfig, LanguageConfig]]':
+        languages = self._languages.get(syntax)
+        if languages is None:
+            languages = []
+            for config in self.configs:
+                language = syntax_language(config, syntax)
+                if language:
+                    languages.append((config, language))
+            self._languages[syntax] = languages
+        return languages
+
+    def is_supported(self, syntax: str) -> bool:
+        return len(self.languages(syntax)) > 0
+
+
+_global_index = None  # type: Optional[SyntaxIndex]
+
+
+def syntax_index(configs: 'List[ClientConfig]') -> SyntaxIndex:
+    """The index for configs, which is rebuilt when a different list of configs is given."""
+    global _global_index
+    if _global_index is None or not _global_index.matches_configs(configs):
+        _global_index = SyntaxIndex(configs)
+    return _global_index
@@ -0,0 +1,38 @@
+from .cache import MeasuredCache
+import unittest
+
+
+class MeasuredCacheTests(unittest.TestCase):
+
+    def test_computes_misses_once(self):
+        cache = MeasuredCache()
+        computed = []
+
+        def compute():
+            computed.append(1)
+            return None
+
+        self.assertIsNone(cache.get("a", compute))
+        self.assertIsNone(cache.get("a", compute))
+        self.assertEqual(len(computed), 1)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+        self.assertGreaterEqual(stats["saved_time"], 0)
+
+    def test_evicts_least_recently_used(self):
+        cache = MeasuredCache(2)
+        cache.get("a", lambda: 1)
+        cache.get("b", lambda: 2)
+        cache.get("a", lambda: 1)
+        cache.get("c", lambda: 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("a", lambda: -1), 1)
+        self.assertEqual(cache.get("b", lambda: -2), -2)
+
+    def test_clear_keeps_stats(self):
+        cache = MeasuredCache()
+        cache.get("a", lambda: 1)
+        cache.clear()
+        self.assertEqual(cache.get("a", lambda: 2), 2)
+        self.assertEqual(cache.stats()["misses"], 2)
@@ -0,0 +1,28 @@
+from .coalesce import LatestUpdates
+import unittest
+
+
+class LatestUpdatesTests(unittest.TestCase):
+
+    def test_keeps_latest_update_per_key(self):
+        updates = LatestUpdates()
+        self.assertTrue(updates.put("a", 1))
+        self.assertFalse(updates.put("b", 2))
+        self.assertFalse(updates.put("a", 3))
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(updates.take(), [3, 2])
+        self.assertEqual(updates.take(), [])
+        self.assertEqual((updates.received, updates.coalesced, updates.batches), (3, 1, 1))
+
+    def test_schedules_again_after_take(self):
+        updates = LatestUpdates()
+        updates.put("a", 1)
+        updates.take()
+        self.assertTrue(updates.put("a", 2))
+
+    def test_replaces_pending_update(self):
+        updates = LatestUpdates()
+        updates.put(("w", "file1"), 1)
+        updates.put(("w", "file2"), 2)
+        updates.put(("w", "file1"), [])
+        self.assertEqual(updates.take(), [[], 2])
@@ -0,0 +1,38 @@
+from .codec import JsonCodec, load_codec
+import unittest
+
+
+PAYLOAD = {"jsonrpc": "2.0", "id": 1, "params": {"text": "é中 \\ / \"quoted\"", "items": [1, 2.5, None, True]}}
+
+
+class CodecTests(unittest.TestCase):
+
+    def assert_round_trips(self, codec):
+        encoded = codec.encode(PAYLOAD)
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual(codec.decode(encoded.decode("UTF-8")), PAYLOAD)
+        self.assertEqual(JsonCodec().decode(encoded.decode("UTF-8")), PAYLOAD)
+
+    def test_stdlib_round_trips(self):
+        self.assert_round_trips(JsonCodec())
+
+    def test_available_codecs_round_trip(self):
+        for name in ("orjson", "ujson"):
+            codec = load_codec((name,))
+            if codec.name == name:
+                self.assert_round_trips(codec)
+
+    def test_falls_back_to_stdlib(self):
+        self.assertEqual(load_codec(()).name, "json")
+
+    def test_encodes_what_stdlib_accepts(self):
+        payload = {"id": 2 ** 70, "map": {1: "a"}}
+        expected = JsonCodec().decode(JsonCodec().encode(payload).decode("UTF-8"))
+        for name in ("orjson", "ujson"):
+            codec = load_codec((name,))
+            self.assertEqual(codec.decode(codec.encode(payload).decode("UTF-8")), expected)
+
+    def test_rejects_invalid_json_with_value_error(self):
+        for name in ("orjson", "ujson", "json"):
+            with self.assertRaises(ValueError):
+                load_codec((name,)).decode('{"id": ')
@@ -0,0 +1,42 @@
+from .debounce import AdaptiveDebounce, DEFAULT_DEBOUNCE
+import unittest
+
+
+class AdaptiveDebounceTests(unittest.TestCase):
+
+    def test_defaults_without_measurements(self):
+        debounce = AdaptiveDebounce(0.1, 1.0)
+        self.assertEqual(debounce.window(1, []), DEFAULT_DEBOUNCE)
+        self.assertEqual(debounce.windows, {1: DEFAULT_DEBOUNCE})
+
+    def test_follows_typing_rate(self):
+        debounce = AdaptiveDebounce(0.05, 1.0)
+        for i in range(0, 10):
+            debounce.on_modified(1, i * 0.08)
+        self.assertAlmostEqual(debounce.window(1, []), 0.16)
+
+    def test_ignores_pauses_in_typing(self):
+        debounce = AdaptiveDebounce(0.05, 1.0)
+        debounce.on_modified(1, 0.0)
+        debounce.on_modified(1, 0.1)
+        debounce.on_modified(1, 5.0)
+        self.assertAlmostEqual(debounce.window(1, []), 0.2)
+
+    def test_waits_for_slowest_server(self):
+        debounce = AdaptiveDebounce(0.05, 1.0)
+        debounce.on_modified(1, 0.0)
+        debounce.on_modified(1, 0.1)
+        debounce.on_sent("slow", "file:///a", 1.0)
+        debounce.on_diagnostics("slow", "file:///a", 1.4)
+        self.assertAlmostEqual(debounce.turnaround("slow") or 0.0, 0.4)
+        self.assertAlmostEqual(debounce.window(1, [0.05, None, debounce.turnaround("slow")]), 0.4)
+
+    def test_diagnostics_without_change_are_ignored(self):
+        debounce = AdaptiveDebounce(0.05, 1.0)
+        debounce.on_diagnostics("test", "file:///a", 1.0)
+        self.assertIsNone(debounce.turnaround("test"))
+
+    def test_clamps_to_floor_and_ceiling(self):
+        debounce = AdaptiveDebounce(0.1, 1.0)
+        self.assertEqual(debounce.window(1, [0.01]), 0.1)
+        self.assertEqual(debounce.window(1, [3.0]), 1.0)
@@ -0,0 +1,77 @@
+from .dispatch import InlineDispatcher, WorkerDispatcher
+import threading
+import time
+import unittest
+
+try:
+    from typing import List, Tuple
+    assert List and Tuple
+except ImportError:
+    pass
+
+
+class InlineDispatcherTests(unittest.TestCase):
+
+    def test_runs_handler_immediately(self):
+        calls = []  # type: List[int]
+        InlineDispatcher().dispatch("key", lambda: calls.append(1))
+        self.assertEqual(calls, [1])
+
+
+class WorkerDispatcherTests(unittest.TestCase):
+
+    def wait_for(self, condition, timeout=5.0):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.005)
+        self.assertTrue(condition())
+
+    def test_keeps_order_per_key(self):
+        dispatcher = WorkerDispatcher(workers=4)
+        calls = []  # type: List[Tuple[str, int]]
+        lock = threading.Lock()
+
+        def handler(key, index):
+            def run():
+                time.sleep(0.001 * (index % 3))
+                with lock:
+                    calls.append((key, index))
+            return run
+
+        for index in range(0, 20):
+            for key in ("a", "b", "c"):
+                dispatcher.dispatch(key, handler(key, index))
+
+        self.wait_for(lambda: len(calls) == 60)
+        for key in ("a", "b", "c"):
+            self.assertEqual([index for k, index in calls if k == key], list(range(0, 20)))
+        self.assertEqual(dispatcher.queued(), 0)
+
+    def test_slow_key_does_not_block_other_keys(self):
+        dispatcher = WorkerDispatcher(workers=2)
+        release = threading.Event()
+        calls = []  # type: List[str]
+
+        def block() -> None:
+            release.wait(5)
+
+        dispatcher.dispatch("slow", block)
+        dispatcher.dispatch("slow", lambda: calls.append("slow"))
+        dispatcher.dispatch("fast", lambda: calls.append("fast"))
+
+        self.wait_for(lambda: calls == ["fast"])
+        release.set()
+        self.wait_for(lambda: calls == ["fast", "slow"])
+
+    def test_survives_handler_error(self):
+        dispatcher = WorkerDispatcher(workers=1)
+        calls = []  # type: List[int]
+
+        def fail():
+            raise Exception("handler failed")
+
+        from .logging import set_exception_logging
+        set_exception_logging(False)
+        dispatcher.dispatch("key", fail)
+        dispatcher.dispatch("key", lambda: calls.append(1))
+        self.wait_for(lambda: calls == [1])
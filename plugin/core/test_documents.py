@@ -85,6 +85,182 @@ class WindowDocumentHandlerTests(unittest.TestCase):
         self.assertIn(basename(__file__), document.get("uri"))
         self.assertFalse(__file__ in handler._document_states)
 
+    def test_sends_incremental_did_change(self):
+        events = Events()
+        view = TestView(__file__)
+        window = TestWindow([[view]])
+        view.set_window(window)
+        handler = WindowDocumentHandler(test_sublime, TestSettings(), window, events, TestConfigs())
+        client = TestClient()
+        client.responses['initialize'] = {"capabilities": dict(textDocumentSync=dict(openClose=True, change=2))}
+        session = self.assert_if_none(
+            create_session(test_config, "", dict(), TestSettings(),
+                           bootstrap_client=client))
+        handler.add_session(session)
+        events.publish("view.on_activated_async", view)
+
+        view._text = "asdf\njklm"
+        events.publish("view.on_modified", view)
+        test_sublime._run_timeout()
+        self.assertEqual(len(client._notifications), 2)
+        changes = client._notifications[1].params["contentChanges"]
+        self.assertEqual(changes, [{
+            "range": {"start": {"line": 0, "character": 4}, "end": {"line": 0, "character": 4}},
+            "text": "\njklm"
+        }])
+
+        view._text = "asdf\njk"
+        events.publish("view.on_modified", view)
+        test_sublime._run_timeout()
+        changes = client._notifications[2].params["contentChanges"]
+        self.assertEqual(changes, [{
+            "range": {"start": {"line": 1, "character": 2}, "end": {"line": 1, "character": 4}},
+            "text": ""
+        }])
+
+    def test_debounces_by_server_turnaround(self):
+        events = Events()
+        view = TestView(__file__)
+        window = TestWindow([[view]])
+        view.set_window(window)
+        handler = WindowDocumentHandler(test_sublime, TestSettings(), window, events, TestConfigs())
+        client = TestClient()
+        client.responses['initialize'] = {"capabilities": dict(textDocumentSync=dict(openClose=True, change=2))}
+        session = self.assert_if_none(
+            create_session(test_config, "", dict(), TestSettings(),
+                           bootstrap_client=client))
+        handler.add_session(session)
+        events.publish("view.on_activated_async", view)
+        handler._debounce.on_sent(test_config.name, "file:///a.py", 0.0)
+        handler._debounce.on_diagnostics(test_config.name, "file:///a.py", 0.8)
+
+        view._text = "asdf\njklm"
+        events.publish("view.on_modified", view)
+        self.assertAlmostEqual(handler.debounce_windows()[view.buffer_id()], 0.8)
+
+    def test_skips_did_change_without_content_change(self):
+        events = Events()
+        view = TestView(__file__)
+        window = TestWindow([[view]])
+        view.set_window(window)
+        handler = WindowDocumentHandler(test_sublime, TestSettings(), window, events, TestConfigs())
+        client = TestClient()
+        session = self.assert_if_none(
+            create_session(test_config, "", dict(), TestSettings(),
+                           bootstrap_client=client))
+        handler.add_session(session)
+        events.publish("view.on_activated_async", view)
+
+        # typing and undoing it again
+        view._text = "asdf jklm"
+        events.publish("view.on_modified", view)
+        view._text = "asdf"
+        events.publish("view.on_modified", view)
+        test_sublime._run_timeout()
+        self.assertEqual(len(client._notifications), 1)
+        self.assertEqual(handler.get_document_state(__file__).version, 0)
+
+        view._text = "asdf jklm"
+        events.publish("view.on_modified", view)
+        test_sublime._run_timeout()
+        self.assertEqual(len(client._notifications), 2)
+        self.assertEqual(client._notifications[1].params["textDocument"]["version"], 1)
+
+    def open_tracked_documents(self, settings):
+        events = Events()
+        views = [TestView("/a.txt"), TestView("/b.txt"), TestView("/c.txt")]
+        window = TestWindow([[views[0], views[1]], [views[2]]])
+        handler = WindowDocumentHandler(test_sublime, settings, window, events, TestConfigs())
+        for view in reversed(views):
+            view.set_window(window)
+            events.publish("view.on_activated_async", view)
+
+        client = TestClient()
+        session = self.assert_if_none(
+            create_session(test_config, "", dict(), TestSettings(),
+                           bootstrap_client=client))
+        handler.add_session(session)
+        return events, views, client
+
+    def opened_files(self, client):
+        return [notification.params["textDocument"]["uri"][-5:] for notification in client._notifications]
+
+    def test_opens_visible_documents_first(self):
+        events, views, client = self.open_tracked_documents(TestSettings())
+        self.assertEqual(self.opened_files(client), ["a.txt", "c.txt"])
+        test_sublime._run_timeout()
+        self.assertEqual(self.opened_files(client), ["a.txt", "c.txt", "b.txt"])
+
+    def test_opens_background_documents_when_activated(self):
+        settings = TestSettings()
+        settings.lazy_background_documents = True
+        events, views, client = self.open_tracked_documents(settings)
+        test_sublime._run_timeout()
+        self.assertEqual(self.opened_files(client), ["a.txt", "c.txt"])
+
+        # changes are not sent before the document is opened
+        views[1]._text = "changed"
+        events.publish("view.on_modified", views[1])
+        test_sublime._run_timeout()
+        self.assertEqual(self.opened_files(client), ["a.txt", "c.txt"])
+
+        events.publish("view.on_activated_async", views[1])
+        self.assertEqual(self.opened_files(client), ["a.txt", "c.txt", "b.txt"])
+        self.assertEqual(client._notifications[2].params["textDocument"]["text"], "changed")
+
+    def open_large_file(self, policy):
+        events = Events()
+        view = TestView(__file__)
+        view._text = "x" * 50 + "\nasdf"
+        window = TestWindow([[view]])
+        view.set_window(window)
+        settings = TestSettings()
+        settings.large_file_line_length = 40
+        settings.large_file_policy = policy
+        handler = WindowDocumentHandler(test_sublime, settings, window, events, TestConfigs())
+        client = TestClient()
+        session = self.assert_if_none(
+            create_session(test_config, "", dict(), TestSettings(),
+                           bootstrap_client=client))
+        handler.add_session(session)
+        events.publish("view.on_activated_async", view)
+        return events, view, handler, client
+
+    def test_measures_turnaround_on_async_thread(self):
+        events = Events()
+        window = TestWindow([[]])
+        handler = WindowDocumentHandler(test_sublime, TestSettings(), window, events, TestConfigs())
+        handler._debounce.on_sent("test", "file:///a.py", 0.0)
+        handler.handle_diagnostics("test", "file:///a.py")
+        self.assertIsNone(handler._debounce.turnaround("test"))
+        test_sublime._run_timeout()
+        self.assertIsNotNone(handler._debounce.turnaround("test"))
+
+    def test_skips_large_files(self):
+        events, view, handler, client = self.open_large_file("skip")
+        self.assertFalse(handler.has_document_state(__file__))
+        self.assertFalse(handler.is_open(__file__, test_config.name))
+        self.assertEqual(len(client._notifications), 0)
+        self.assertEqual(view.settings().get("lsp_large_file"), "skip")
+        self.assertEqual(view.settings().get("lsp_large_file_reason"), "lines over 40 characters")
+
+    def test_opens_large_files_read_only(self):
+        events, view, handler, client = self.open_large_file("read_only")
+        self.assertEqual(len(client._notifications), 1)
+        self.assertTrue(handler.is_open(__file__, test_config.name))
+        view._text = "asdf"
+        events.publish("view.on_modified", view)
+        test_sublime._run_timeout()
+        self.assertEqual(len(client._notifications), 1)
+
+    def test_opens_large_files_in_incremental_sessions_only(self):
+        events, view, handler, client = self.open_large_file("incremental")
+        self.assertEqual(len(client._notifications), 0)
+        self.assertFalse(handler.is_open(__file__, test_config.name))
+        # a later attempt reports that nothing was sent
+        session = handler._sessions[test_config.name]
+        self.assertFalse(handler._open_in_session(__file__, session))
+
     def test_ignores_views_from_other_window(self):
         events = Events()
         window = TestWindow()
@@ -0,0 +1,100 @@
+from .eventloop import EventLoop, event_loop_supported
+from .transports import ContentLengthDecoder, EventLoopTCPTransport, EventLoopStdioTransport
+import os
+import socket
+import subprocess
+import threading
+import unittest
+
+try:
+    from typing import List, Set
+    assert List and Set
+except ImportError:
+    pass
+
+
+def frame(content: bytes) -> bytes:
+    return b"Content-Length: " + str(len(content)).encode("ascii") + b"\r\n\r\n" + content
+
+
+class Receiver(object):
+
+    def __init__(self, expected: int) -> None:
+        self.messages = []  # type: List[str]
+        self.threads = set()  # type: Set[threading.Thread]
+        self.expected = expected
+        self.closed = False
+        self.done = threading.Event()
+
+    def on_receive(self, message: str) -> None:
+        self.threads.add(threading.current_thread())
+        self.messages.append(message)
+        if len(self.messages) == self.expected:
+            self.done.set()
+
+    def on_closed(self) -> None:
+        self.closed = True
+        self.done.set()
+
+
+@unittest.skipUnless(event_loop_supported, "select() can't wait on pipes on this platform")
+class EventLoopTests(unittest.TestCase):
+
+    def test_calls_reader_when_readable(self):
+        loop = EventLoop()
+        read_fd, write_fd = os.pipe()
+        received = threading.Event()
+
+        def on_readable() -> None:
+            os.read(read_fd, 10)
+            received.set()
+
+        loop.add_reader(read_fd, on_readable)
+        self.assertEqual(loop.watched(), 1)
+        os.write(write_fd, b"x")
+        self.assertTrue(received.wait(5))
+        loop.remove_reader(read_fd)
+        self.assertEqual(loop.watched(), 0)
+        os.close(read_fd)
+        os.close(write_fd)
+
+    def test_tcp_transport_round_trip(self):
+        loop = EventLoop()
+        client_socket, server_socket = socket.socketpair()
+        transport = EventLoopTCPTransport(client_socket, loop)
+        receiver = Receiver(2)
+        transport.start(receiver.on_receive, receiver.on_closed)
+
+        transport.send(frame(b'{"id": 1}'))
+        decoder = ContentLengthDecoder()
+        self.assertEqual(decoder.feed(server_socket.recv(4096)), [b'{"id": 1}'])
+
+        server_socket.sendall(frame(b'{"id": 2}') + frame(b'{"id": 3}'))
+        self.assertTrue(receiver.done.wait(5))
+        self.assertEqual(receiver.messages, ['{"id": 2}', '{"id": 3}'])
+        # handled off the loop thread, which is left to do I/O.
+        self.assertNotIn(loop._thread, receiver.threads)
+
+        receiver.done.clear()
+        server_socket.close()
+        self.assertTrue(receiver.done.wait(5))
+        self.assertTrue(receiver.closed)
+        self.assertEqual(loop.watched(), 0)
+
+    def test_stdio_transport_writes_large_flush(self):
+        loop = EventLoop()
+        process = subprocess.Popen(["cat"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        transport = EventLoopStdioTransport(process, loop)
+        # larger than a pipe buffer, so the write has to resume once cat has read some.
+        contents = ['{{"id": {}, "text": "{}"}}'.format(i, "x" * 100000) for i in range(0, 3)]
+        receiver = Receiver(len(contents))
+        transport.start(receiver.on_receive, receiver.on_closed)
+        for content in contents:
+            transport.send(frame(content.encode("ascii")))
+
+        self.assertTrue(receiver.done.wait(5))
+        self.assertEqual(receiver.messages, contents)
+        self.assertEqual(transport.write_stats.messages, 3)
+        transport.close()
+        # closing stdin ends cat, and communicate closes the pipes.
+        process.communicate()
@@ -0,0 +1,37 @@
+from .intervals import IntervalTree
+import random
+import unittest
+
+
+class IntervalTreeTests(unittest.TestCase):
+
+    def test_empty(self):
+        tree = IntervalTree([])
+        self.assertEqual(len(tree), 0)
+        self.assertEqual(tree.containing(1), [])
+
+    def test_closed_intervals(self):
+        tree = IntervalTree([(1, 3, "a"), (3, 5, "b"), (6, 6, "c")])
+        self.assertEqual(tree.containing(3), ["a", "b"])
+        self.assertEqual(tree.containing(6), ["c"])
+        self.assertEqual(tree.containing(0), [])
+        self.assertEqual(tree.overlapping(4, 10), ["b", "c"])
+
+    def test_tuple_keys(self):
+        tree = IntervalTree([((0, 4), (0, 8), "first"), ((1, 0), (2, 3), "second")])
+        self.assertEqual(tree.containing((0, 5)), ["first"])
+        self.assertEqual(tree.overlapping((2, 0), (2, 100)), ["second"])
+        self.assertEqual(tree.containing((0, 9)), [])
+
+    def test_matches_linear_scan_in_original_order(self):
+        generator = random.Random(7)
+        intervals = []
+        for i in range(300):
+            start = generator.randint(0, 1000)
+            intervals.append((start, start + generator.randint(0, 50), i))
+        tree = IntervalTree(intervals)
+        for _ in range(200):
+            low = generator.randint(-10, 1060)
+            high = low + generator.randint(0, 20)
+            expected = [value for start, end, value in intervals if start <= high and end >= low]
+            self.assertEqual(tree.overlapping(low, high), expected)
@@ -0,0 +1,27 @@
+from .largefile import large_file_reason
+import unittest
+
+
+class LargeFileReasonTests(unittest.TestCase):
+
+    def reason(self, text, max_size=100, max_line_length=10):
+        return large_file_reason(len(text), lambda: text, max_size, max_line_length)
+
+    def test_accepts_small_files(self):
+        self.assertIsNone(self.reason("short\nlines\n"))
+        self.assertIsNone(self.reason("0123456789\n0123456789"))
+
+    def test_detects_size(self):
+        self.assertEqual(self.reason("a\n" * 60), "over 100 characters")
+
+    def test_size_is_checked_without_reading_text(self):
+        def fail():
+            raise AssertionError("text was read")
+        self.assertEqual(large_file_reason(1000, fail, 100, 10), "over 100 characters")
+
+    def test_detects_long_lines(self):
+        self.assertEqual(self.reason("short\n01234567890\nshort"), "lines over 10 characters")
+        self.assertEqual(self.reason("short\n01234567890"), "lines over 10 characters")
+
+    def test_zero_disables_checks(self):
+        self.assertIsNone(self.reason("a" * 1000, 0, 0))
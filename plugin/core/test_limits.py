@@ -0,0 +1,35 @@
+from .limits import limit_diagnostics, most_severe
+import unittest
+
+
+def diagnostic(message: str, severity=None) -> dict:
+    d = {"message": message, "range": {"start": {"line": 0, "character": 0}, "end": {"line": 0, "character": 1}}}
+    if severity is not None:
+        d["severity"] = severity
+    return d
+
+
+class LimitDiagnosticsTests(unittest.TestCase):
+
+    def test_filters_by_severity(self):
+        items = [diagnostic("e"), diagnostic("w", 2), diagnostic("i", 3), diagnostic("h", 4)]
+        kept, dropped = limit_diagnostics(items, 2, -1)
+        self.assertEqual([d["message"] for d in kept], ["e", "w"])
+        self.assertEqual(dropped, 0)
+
+    def test_keeps_most_severe_in_order(self):
+        items = [diagnostic("w1", 2), diagnostic("e1", 1), diagnostic("w2", 2), diagnostic("e2"), diagnostic("w3", 2)]
+        kept, dropped = limit_diagnostics(items, 4, 3)
+        self.assertEqual([d["message"] for d in kept], ["w1", "e1", "e2"])
+        self.assertEqual(dropped, 2)
+
+    def test_zero_limit(self):
+        kept, dropped = limit_diagnostics([diagnostic("e")], 4, 0)
+        self.assertEqual(kept, [])
+        self.assertEqual(dropped, 1)
+
+    def test_most_severe_objects(self):
+        kept, dropped = most_severe([(2, "a"), (1, "b"), (3, "c")], 2, lambda d: d[0])
+        self.assertEqual(kept, [(2, "a"), (1, "b")])
+        self.assertEqual(dropped, 1)
+        self.assertEqual(most_severe([(1, "a")], -1, lambda d: d[0]), ([(1, "a")], 0))
@@ -0,0 +1,52 @@
+from .lineindex import LineIndex, utf16_to_offset, offset_to_utf16
+from .protocol import Point, Range
+from .sync import offset_to_position
+import unittest
+
+
+class Utf16Tests(unittest.TestCase):
+
+    def test_converts_columns(self):
+        line = "a\U0001F600b"
+        self.assertEqual(utf16_to_offset(line, 1), 1)
+        self.assertEqual(utf16_to_offset(line, 3), 2)
+        self.assertEqual(utf16_to_offset(line, 10), 3)
+        self.assertEqual(offset_to_utf16(line, 2), 3)
+        self.assertEqual(offset_to_utf16(line, 3), 4)
+
+
+class LineIndexTests(unittest.TestCase):
+
+    def test_offsets(self):
+        index = LineIndex("abc\ndef\n\nghi")
+        self.assertEqual(index.line_count(), 4)
+        self.assertEqual(index.offset(0, 0), 0)
+        self.assertEqual(index.offset(1, 2), 6)
+        self.assertEqual(index.offset(3, 3), 12)
+
+    def test_clamps_positions(self):
+        index = LineIndex("abc\ndef")
+        self.assertEqual(index.offset(0, 10), 3)
+        self.assertEqual(index.offset(5, 0), 7)
+        self.assertEqual(index.position(100), (1, 3))
+
+    def test_utf16_columns(self):
+        index = LineIndex("x\n\U0001F600y = 1\nz")
+        self.assertEqual(index.offset(1, 2), 3)
+        self.assertEqual(index.offset(1, 3), 4)
+        self.assertEqual(index.offset(2, 1), 10)
+        self.assertEqual(index.position(4), (1, 3))
+
+    def test_positions_round_trip(self):
+        text = "first\né\U0001F600 second\n\nlast \U0001F600\U0001F600 line"
+        index = LineIndex(text)
+        for offset in range(len(text) + 1):
+            position = offset_to_position(text, offset)
+            self.assertEqual(index.position(offset), (position["line"], position["character"]))
+            self.assertEqual(index.offset(position["line"], position["character"]), offset)
+
+    def test_converts_ranges(self):
+        index = LineIndex("abc\ndef")
+        ranges = [Range(Point(0, 1), Point(1, 2)), Range(Point(1, 0), Point(1, 3))]
+        self.assertEqual(index.ranges_to_offsets(ranges), [(1, 6), (4, 7)])
+        self.assertEqual(index.offset_to_point(5).to_lsp(), {"line": 1, "character": 1})
@@ -0,0 +1,17 @@
+from .process import attach_logger
+import subprocess
+import sys
+import unittest
+
+
+class AttachLoggerTests(unittest.TestCase):
+
+    def test_sets_ready_on_matching_line(self):
+        process = subprocess.Popen(
+            [sys.executable, "-c", "print('starting'); print('listening on 1234'); input()"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        ready = attach_logger(process, process.stdout, log=False, ready_pattern=r"listening on \d+")
+        self.assertTrue(ready.wait(5))
+        self.assertIsNone(process.poll())
+        # communicate closes the pipes once the process exits.
+        process.communicate(b"\n")
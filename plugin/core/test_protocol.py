@@ -61,6 +61,23 @@ class DiagnosticTests(unittest.TestCase):
         self.assertEqual(diag.source, 'pyls')
         self.assertEqual(diag.to_lsp(), LSP_FULL_DIAGNOSTIC)
 
+    def test_keeps_other_keys(self):
+        lsp_diagnostic = dict(LSP_FULL_DIAGNOSTIC, code="E501", relatedInformation=[{"message": "here"}])
+        diag = Diagnostic.from_lsp(lsp_diagnostic)
+        self.assertEqual(diag.code, "E501")
+        self.assertEqual(diag.to_lsp(), lsp_diagnostic)
+
+    def test_bulk_lsp_conversion(self):
+        diagnostics = Diagnostic.from_lsp_list([LSP_MINIMAL_DIAGNOSTIC, LSP_FULL_DIAGNOSTIC])
+        self.assertEqual([d.severity for d in diagnostics], [DiagnosticSeverity.Error, DiagnosticSeverity.Warning])
+        self.assertEqual(Diagnostic.from_lsp_list([]), [])
+
+    def test_is_slotted(self):
+        diag = Diagnostic.from_lsp(LSP_FULL_DIAGNOSTIC)
+        self.assertFalse(hasattr(diag, '__dict__'))
+        self.assertFalse(hasattr(diag.range, '__dict__'))
+        self.assertFalse(hasattr(diag.range.start, '__dict__'))
+
 
 class RequestTests(unittest.TestCase):
 
@@ -1,6 +1,10 @@
-from .rpc import (format_request, Client)
+from .rpc import (format_request, Client, RequestTimeout, ResponseError, peek_response_id, dispatch_key,
+                  message_priority, PendingRequest, PendingRequests)
+from .codec import JsonCodec
+from .transports import PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BULK, PrioritySendQueue, take_queued_messages
+from . import rpc
 from .transports import Transport
-from .protocol import (Request, Notification)
+from .protocol import (Request, Notification, ErrorCodes)
 from .types import Settings
 from .logging import set_exception_logging
 import unittest
@@ -46,7 +50,7 @@ def notify_pong(message):
 
 class TestTransport(Transport):
     def __init__(self, responder=None):
-        self.messages = []  # type: List[str]
+        self.messages = []  # type: List[bytes]
         self.responder = responder
 
     def start(self, on_receive, on_closed):
@@ -54,7 +58,7 @@ class TestTransport(Transport):
         self.on_closed = on_closed
         self.has_started = True
 
-    def send(self, message):
+    def send(self, message, priority=None, key=None):
         self.messages.append(message)
         if self.responder:
             self.on_receive(self.responder(message))
@@ -66,10 +70,111 @@ class TestTransport(Transport):
         self.on_closed()
 
 
+class QueueingTransport(TestTransport):
+    """Keeps sent messages queued until flushed."""
+
+    def __init__(self):
+        super().__init__()
+        self.send_queue = PrioritySendQueue()
+
+    def send(self, message, priority=PRIORITY_NORMAL, key=None):
+        self.send_queue.put(message, priority, key)
+
+    def withdraw(self, message):
+        return self.send_queue.remove(message)
+
+    def flush(self):
+        self.send_queue.put(None)
+        messages, _ = take_queued_messages(self.send_queue)
+        return [json.loads(m.split(b"\r\n\r\n")[1].decode("UTF-8")) for m in messages]
+
+
+class WrittenQueueingTransport(QueueingTransport):
+    """As if the writer already took every message, so none can be withdrawn."""
+
+    def withdraw(self, message):
+        return False
+
+
 class FormatTests(unittest.TestCase):
 
-    def test_converts_payload_to_string(self):
-        self.assertEqual("Content-Length: 2\r\n\r\n{}", format_request(dict()))
+    def test_converts_payload_to_bytes(self):
+        self.assertEqual(b"Content-Length: 2\r\n\r\n{}", format_request(dict()))
+
+    def test_counts_content_length_in_bytes(self):
+        message = format_request({"text": "é中"}, JsonCodec())
+        header, content = message.split(b"\r\n\r\n")
+        self.assertEqual(content.decode("UTF-8"), '{"text": "é中"}')
+        self.assertEqual(header, "Content-Length: {}".format(len(content)).encode("ascii"))
+
+
+class PeekResponseIdTests(unittest.TestCase):
+
+    def test_finds_leading_id(self):
+        self.assertEqual(peek_response_id('{"id": 12, "result": {"id": 3}}'), 12)
+        self.assertEqual(peek_response_id('{"jsonrpc": "2.0", "id": 12, "result": null}'), 12)
+
+    def test_finds_trailing_id(self):
+        self.assertEqual(peek_response_id('{"jsonrpc":"2.0","result":[{"id":3}],"id":12}'), 12)
+
+    def test_ignores_nested_ids(self):
+        self.assertIsNone(peek_response_id('{"jsonrpc":"2.0","result":{"items":[],"id":3}}'))
+
+    def test_ignores_server_requests(self):
+        self.assertIsNone(peek_response_id('{"id": 12, "method": "workspace/applyEdit", "params": {}}'))
+        long_params = json.dumps({"changes": {"file:///a.py": [{"newText": "x" * 200}]}})
+        request = '{"params": ' + long_params + ', "method": "workspace/applyEdit", "id": 12}'
+        self.assertIsNone(peek_response_id(request))
+
+
+class DispatchKeyTests(unittest.TestCase):
+
+    def test_orders_by_document(self):
+        notification = {"method": "textDocument/publishDiagnostics", "params": {"uri": "file:///a.py"}}
+        self.assertEqual(dispatch_key(notification), "file:///a.py")
+        request = {"id": 1, "method": "x", "params": {"textDocument": {"uri": "file:///b.py"}}}
+        self.assertEqual(dispatch_key(request), "file:///b.py")
+
+    def test_orders_by_method_without_document(self):
+        self.assertEqual(dispatch_key({"method": "window/logMessage", "params": {"message": "hi"}}),
+                         "window/logMessage")
+        self.assertEqual(dispatch_key({"method": "pong"}), "pong")
+
+
+class MessagePriorityTests(unittest.TestCase):
+
+    def test_prioritizes_interactive_requests(self):
+        self.assertEqual(message_priority(Request.complete(dict()).to_payload(1)), PRIORITY_INTERACTIVE)
+        self.assertEqual(message_priority(Notification.didChange(dict()).to_payload()), PRIORITY_INTERACTIVE)
+
+    def test_defers_bulk_traffic(self):
+        self.assertEqual(message_priority(Notification.didOpen(dict()).to_payload()), PRIORITY_BULK)
+        self.assertEqual(message_priority(Notification.didChangeConfiguration(dict()).to_payload()), PRIORITY_BULK)
+
+    def test_defaults_to_normal(self):
+        self.assertEqual(message_priority(Request.hover(dict()).to_payload(1)), PRIORITY_NORMAL)
+
+
+class PendingRequestsTests(unittest.TestCase):
+
+    def test_supersedes_and_forgets_latest_request(self):
+        requests = PendingRequests()
+        first = PendingRequest(1, "textDocument/hover", None, None, None, "key")
+        second = PendingRequest(2, "textDocument/hover", None, None, None, "key")
+        self.assertIsNone(requests.supersede(first))
+        self.assertEqual(requests.supersede(second), 1)
+        # an older request does not forget the newer one
+        requests.forget_superseding(first)
+        self.assertEqual(requests.supersede(first), 2)
+
+    def test_pops_cancelled_requests_once(self):
+        requests = PendingRequests()
+        self.assertFalse(requests.has_cancelled())
+        requests.add_cancelled(PendingRequest(1, "textDocument/hover", None, None, None))
+        self.assertTrue(requests.has_cancelled())
+        self.assertTrue(requests.pop_cancelled(1))
+        self.assertFalse(requests.pop_cancelled(1))
+        self.assertFalse(requests.has_cancelled())
 
 
 class ClientTest(unittest.TestCase):
@@ -159,3 +264,133 @@ class ClientTest(unittest.TestCase):
         req = Request.initialize(dict())
         client.send_request(req, lambda resp: raise_error('handler failed'))
         # exception would fail test if not handled in client
+
+    def test_forgets_handlers_after_response(self):
+        transport = TestTransport(return_result)
+        client = Client(transport, TestSettings())
+        future = client.send_request(Request.initialize(dict()), lambda resp: None)
+        self.assertTrue(future.done())
+        self.assertEqual(future.result(), {})
+        self.assertEqual(client.pending_requests_stats()["in_flight"], 0)
+
+    def test_forgets_handlers_after_error(self):
+        transport = TestTransport(return_error)
+        client = Client(transport, TestSettings())
+        errors = []
+        future = client.send_request(Request.initialize(dict()), lambda resp: None, lambda err: errors.append(err))
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(future.exception(), ResponseError)
+        self.assertEqual(client.pending_requests_stats()["in_flight"], 0)
+
+    def test_reports_in_flight_requests(self):
+        transport = TestTransport()
+        client = Client(transport, TestSettings())
+        client.send_request(Request.hover(dict()), lambda resp: None)
+        client.send_request(Request.hover(dict()), lambda resp: None)
+        stats = client.pending_requests_stats()
+        self.assertEqual(stats["in_flight"], 2)
+        self.assertEqual(stats["by_method"], {"textDocument/hover": 2})
+        self.assertGreaterEqual(stats["oldest_age"], 0)
+
+    def test_expires_requests_after_timeout(self):
+        transport = TestTransport()
+        client = Client(transport, TestSettings())
+        errors = []
+        original_timeouts = rpc.REQUEST_TIMEOUTS
+        rpc.REQUEST_TIMEOUTS = {"textDocument/hover": -1}
+        try:
+            future = client.send_request(Request.hover(dict()), lambda resp: None, lambda err: errors.append(err))
+            client.expire_requests()
+        finally:
+            rpc.REQUEST_TIMEOUTS = original_timeouts
+        self.assertIsInstance(future.exception(timeout=1), RequestTimeout)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0]["code"], ErrorCodes.RequestTimedOut)
+        self.assertEqual(client.pending_requests_stats()["in_flight"], 0)
+        cancel = json.loads(transport.messages[1].split(b"\r\n\r\n")[1].decode("UTF-8"))
+        self.assertEqual((cancel["method"], cancel["params"]), ("$/cancelRequest", {"id": 1}))
+
+        # a late response is dropped, even an error
+        displayed = []  # type: List[str]
+        client.set_error_display_handler(lambda msg: displayed.append(msg))
+        transport.receive('{"id": 1, "error": {"code": -32800, "message": "cancelled"}}')
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(displayed, [])
+
+    def test_expires_requests_while_idle(self):
+        transport = TestTransport()
+        client = Client(transport, TestSettings())
+        errors = []
+        original_timeouts = rpc.REQUEST_TIMEOUTS
+        rpc.REQUEST_TIMEOUTS = {"textDocument/hover": 0.01, "textDocument/definition": 0.05}
+        try:
+            later = client.send_request(Request.definition(dict()), lambda resp: None, lambda err: errors.append(1))
+            sooner = client.send_request(Request.hover(dict()), lambda resp: None, lambda err: errors.append(2))
+        finally:
+            rpc.REQUEST_TIMEOUTS = original_timeouts
+        # nothing else is sent, only the timer can expire them.
+        self.assertIsInstance(sooner.exception(timeout=2), RequestTimeout)
+        self.assertIsInstance(later.exception(timeout=2), RequestTimeout)
+        self.assertEqual(errors, [2, 1])
+        self.assertEqual(client.pending_requests_stats()["in_flight"], 0)
+
+    def test_cancels_request(self):
+        transport = TestTransport()
+        client = Client(transport, TestSettings())
+        responses = []
+        future = client.send_request(Request.hover(dict()), lambda resp: responses.append(resp))
+        self.assertTrue(future.cancel())
+        self.assertEqual(len(transport.messages), 2)
+        cancel = json.loads(transport.messages[1].split(b"\r\n\r\n")[1].decode("UTF-8"))
+        self.assertEqual(cancel["method"], "$/cancelRequest")
+        self.assertEqual(cancel["params"], {"id": 1})
+        self.assertEqual(client.pending_requests_stats()["in_flight"], 0)
+
+        transport.receive('{"id": 1, "result": {}}')
+        self.assertEqual(len(responses), 0)
+
+    def test_withdraws_queued_request_instead_of_cancelling(self):
+        transport = QueueingTransport()
+        client = Client(transport, TestSettings())
+        client.send_request(Request.hover(dict()), lambda resp: None, supersede_key=1)
+        client.send_request(Request.hover(dict()), lambda resp: None, supersede_key=1)
+        sent = transport.flush()
+        self.assertEqual([(m.get("method"), m.get("id")) for m in sent], [("textDocument/hover", 2)])
+
+    def test_cancel_does_not_overtake_request(self):
+        transport = WrittenQueueingTransport()
+        client = Client(transport, TestSettings())
+        params = {"textDocument": {"uri": "file:///a.py"}, "position": {"line": 0, "character": 0}}
+        future = client.send_request(Request.hover(params), lambda resp: None)
+        future.cancel()
+        sent = transport.flush()
+        self.assertEqual([m["method"] for m in sent], ["textDocument/hover", "$/cancelRequest"])
+
+    def test_handles_server_request_reusing_cancelled_id(self):
+        transport = TestTransport()
+        client = Client(transport, TestSettings())
+        edits = []
+        client.on_request("workspace/applyEdit", lambda params: edits.append(params))
+        future = client.send_request(Request.hover(dict()), lambda resp: None)
+        future.cancel()
+
+        # a server request with the cancelled request's id, and its method after long params
+        params = {"edit": {"changes": {"file:///a.py": [{"newText": "x" * 200}]}}}
+        transport.receive('{"params": ' + json.dumps(params) + ', "method": "workspace/applyEdit", "id": 1}')
+        self.assertEqual(edits, [params])
+
+    def test_supersedes_request_for_same_key(self):
+        transport = TestTransport()
+        client = Client(transport, TestSettings())
+        responses = []
+        first = client.send_request(Request.hover(dict()), lambda resp: responses.append(1), supersede_key=5)
+        other_view = client.send_request(Request.hover(dict()), lambda resp: responses.append(2), supersede_key=6)
+        second = client.send_request(Request.hover(dict()), lambda resp: responses.append(3), supersede_key=5)
+        self.assertTrue(first.cancelled())
+        self.assertFalse(other_view.cancelled())
+        self.assertFalse(second.cancelled())
+
+        transport.receive('{"id": 1, "result": {}}')
+        transport.receive('{"id": 2, "result": {}}')
+        transport.receive('{"id": 3, "result": {}}')
+        self.assertEqual(responses, [2, 3])
@@ -0,0 +1,37 @@
+from .sections import Sections
+import unittest
+
+
+def apply(text: str, replacement) -> str:
+    begin, end, characters = replacement
+    return text[:begin] + characters + text[end:]
+
+
+class SectionsTests(unittest.TestCase):
+
+    def test_appends_new_sections(self):
+        sections = Sections()
+        self.assertEqual(sections.set("a", "first\n"), (0, 0, "first\n"))
+        self.assertEqual(sections.set("b", "second\n"), (6, 6, "second\n"))
+        self.assertEqual(sections.text(), "first\nsecond\n")
+        self.assertEqual(sections.size, 13)
+        self.assertEqual(len(sections), 2)
+
+    def test_replaces_sections_in_place(self):
+        sections = Sections()
+        text = ""
+        for key, value in [("a", "1\n"), ("b", "2\n"), ("c", "3\n"), ("b", "two\n"), ("a", ""), ("d", "4\n")]:
+            text = apply(text, sections.set(key, value))
+            self.assertEqual(text, sections.text())
+            self.assertEqual(len(text), sections.size)
+        self.assertEqual(text, "two\n3\n4\n")
+        self.assertFalse("a" in sections)
+
+    def test_unchanged_sections(self):
+        sections = Sections()
+        sections.set("a", "1\n")
+        self.assertIsNone(sections.set("a", "1\n"))
+        self.assertIsNone(sections.set("b", ""))
+        sections.clear()
+        self.assertEqual(sections.size, 0)
+        self.assertEqual(sections.text(), "")
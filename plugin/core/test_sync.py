@@ -0,0 +1,96 @@
+from .sync import (common_prefix_length, common_suffix_length, offset_to_position, incremental_change,
+                   content_change, text_sync_kind)
+from .protocol import TextDocumentSyncKindNone, TextDocumentSyncKindFull, TextDocumentSyncKindIncremental
+import random
+import unittest
+
+
+def position_to_offset(text: str, position: dict) -> int:
+    lines = text.split("\n")
+    line = lines[position["line"]]
+    character = 0
+    units = 0
+    while units < position["character"]:
+        units += len(line[character].encode("UTF-16-LE")) // 2
+        character += 1
+    return sum(len(previous) + 1 for previous in lines[:position["line"]]) + character
+
+
+def apply_change(text: str, change: dict) -> str:
+    start = position_to_offset(text, change["range"]["start"])
+    end = position_to_offset(text, change["range"]["end"])
+    return text[:start] + change["text"] + text[end:]
+
+
+class CommonAffixTests(unittest.TestCase):
+
+    def test_prefix(self):
+        self.assertEqual(common_prefix_length("abcdef", "abcxef"), 3)
+        self.assertEqual(common_prefix_length("abc", "abcdef"), 3)
+        self.assertEqual(common_prefix_length("", "abc"), 0)
+        self.assertEqual(common_prefix_length("xbc", "abc"), 0)
+
+    def test_suffix(self):
+        self.assertEqual(common_suffix_length("abcdef", "abxdef", 6), 3)
+        self.assertEqual(common_suffix_length("abcdef", "abxdef", 2), 2)
+        self.assertEqual(common_suffix_length("def", "abcdef", 6), 3)
+
+
+class OffsetToPositionTests(unittest.TestCase):
+
+    def test_counts_lines_and_characters(self):
+        self.assertEqual(offset_to_position("ab\ncd\nef", 0), {"line": 0, "character": 0})
+        self.assertEqual(offset_to_position("ab\ncd\nef", 4), {"line": 1, "character": 1})
+        self.assertEqual(offset_to_position("ab\ncd\n", 6), {"line": 2, "character": 0})
+
+    def test_counts_utf16_code_units(self):
+        self.assertEqual(offset_to_position("a😀b", 2), {"line": 0, "character": 3})
+        self.assertEqual(offset_to_position("é中b", 2), {"line": 0, "character": 2})
+
+
+class IncrementalChangeTests(unittest.TestCase):
+
+    def test_insertion(self):
+        change = incremental_change("hello\nworld", "hello\nbig world")
+        self.assertEqual(change, {
+            "range": {"start": {"line": 1, "character": 0}, "end": {"line": 1, "character": 0}},
+            "text": "big "
+        })
+
+    def test_deletion_across_lines(self):
+        change = incremental_change("one\ntwo\nthree", "one\nthree")
+        self.assertEqual(change["text"], "")
+        self.assertEqual(apply_change("one\ntwo\nthree", change), "one\nthree")
+
+    def test_repeated_characters(self):
+        # the prefix and suffix must not overlap when the edit is ambiguous.
+        self.assertEqual(apply_change("aaaa", incremental_change("aaaa", "aaaaaa")), "aaaaaa")
+        self.assertEqual(apply_change("aaaa", incremental_change("aaaa", "aa")), "aa")
+
+    def test_random_edits_apply(self):
+        rng = random.Random(42)
+        alphabet = "ab \n😀é"
+        text = "".join(rng.choice(alphabet) for _ in range(0, 200))
+        for _ in range(0, 300):
+            new = text
+            for _ in range(0, rng.randint(1, 3)):
+                start = rng.randint(0, len(new))
+                end = rng.randint(start, min(len(new), start + 10))
+                new = new[:start] + "".join(rng.choice(alphabet) for _ in range(0, rng.randint(0, 5))) + new[end:]
+            self.assertEqual(apply_change(text, incremental_change(text, new)), new)
+            text = new
+
+
+class ContentChangeTests(unittest.TestCase):
+
+    def test_sync_kind(self):
+        self.assertEqual(text_sync_kind({"textDocumentSync": 2}), TextDocumentSyncKindIncremental)
+        self.assertEqual(text_sync_kind({"textDocumentSync": {"openClose": True, "change": 1}}),
+                         TextDocumentSyncKindFull)
+        self.assertEqual(text_sync_kind({"textDocumentSync": {"openClose": True}}), TextDocumentSyncKindNone)
+        self.assertEqual(text_sync_kind({}), TextDocumentSyncKindNone)
+
+    def test_full_sync_unless_incremental(self):
+        self.assertEqual(content_change("a", "ab", TextDocumentSyncKindFull), {"text": "ab"})
+        self.assertEqual(content_change(None, "ab", TextDocumentSyncKindIncremental), {"text": "ab"})
+        self.assertIn("range", content_change("a", "ab", TextDocumentSyncKindIncremental))
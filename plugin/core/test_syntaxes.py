@@ -0,0 +1,52 @@
+from .syntaxes import SyntaxIndex, config_supports_syntax, syntax_index, syntax_language
+from .types import ClientConfig, LanguageConfig
+import unittest
+
+
+python = LanguageConfig("python", ["source.python"], ["Packages/Python/Python.sublime-syntax"])
+magic_python = LanguageConfig("python", ["source.python"], ["MagicPython"])
+javascript = LanguageConfig("javascript", ["source.js"],
+                            ["Packages/JavaScript/JavaScript.sublime-syntax", "Babel"])
+pyls = ClientConfig("pyls", [], None, languages=[python, magic_python])
+tsserver = ClientConfig("tsserver", [], None, languages=[javascript])
+
+PYTHON_SYNTAX = "Packages/Python/Python.sublime-syntax"
+MAGIC_SYNTAX = "Packages/MagicPython/grammars/MagicPython.tmLanguage"
+BABEL_SYNTAX = "Packages/Babel/JavaScript (Babel).sublime-syntax"
+
+
+class SyntaxMatchingTests(unittest.TestCase):
+
+    def test_matches_syntaxes_as_words(self):
+        self.assertEqual(syntax_language(pyls, PYTHON_SYNTAX), python)
+        self.assertEqual(syntax_language(pyls, MAGIC_SYNTAX), magic_python)
+        self.assertTrue(config_supports_syntax(tsserver, BABEL_SYNTAX))
+        self.assertFalse(config_supports_syntax(pyls, "Packages/Python/Python Regex.sublime-syntax"))
+        self.assertFalse(config_supports_syntax(pyls, None))
+
+    def test_ignores_case(self):
+        self.assertTrue(config_supports_syntax(tsserver, "Packages/babel/babel.sublime-syntax"))
+
+
+class SyntaxIndexTests(unittest.TestCase):
+
+    def test_finds_configs_and_languages(self):
+        index = SyntaxIndex([pyls, tsserver])
+        self.assertEqual(index.languages(MAGIC_SYNTAX), [(pyls, magic_python)])
+        self.assertEqual(index.languages(BABEL_SYNTAX), [(tsserver, javascript)])
+        self.assertTrue(index.is_supported(PYTHON_SYNTAX))
+        self.assertFalse(index.is_supported("Packages/Text/Plain text.tmLanguage"))
+
+    def test_rebuilds_for_other_configs(self):
+        configs = [pyls]
+        index = syntax_index(configs)
+        self.assertIs(syntax_index(configs), index)
+        self.assertFalse(index.is_supported(BABEL_SYNTAX))
+
+        configs.append(tsserver)
+        index = syntax_index(configs)
+        self.assertTrue(index.is_supported(BABEL_SYNTAX))
+
+        other = syntax_index([pyls])
+        self.assertIsNot(other, index)
+        self.assertFalse(other.is_supported(BABEL_SYNTAX))
@@ -0,0 +1,191 @@
+from .transports import ContentLengthDecoder, TCPTransport, PrioritySendQueue, take_queued_messages, connect_tcp
+from .transports import PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BULK
+from queue import Empty
+import json
+import socket
+import threading
+import unittest
+
+
+def frame(content: bytes) -> bytes:
+    return b"Content-Length: " + str(len(content)).encode("ascii") + b"\r\n\r\n" + content
+
+
+class ContentLengthDecoderTests(unittest.TestCase):
+
+    def test_decodes_single_message(self):
+        decoder = ContentLengthDecoder()
+        self.assertEqual(decoder.feed(frame(b'{"id": 1}')), [b'{"id": 1}'])
+        self.assertEqual(decoder.pending(), 0)
+
+    def test_decodes_multiple_messages_in_one_chunk(self):
+        decoder = ContentLengthDecoder()
+        data = frame(b'{"id": 1}') + frame(b'{"id": 2}') + frame(b'{"id": 3}')
+        self.assertEqual(decoder.feed(data), [b'{"id": 1}', b'{"id": 2}', b'{"id": 3}'])
+
+    def test_decodes_message_split_at_every_byte(self):
+        decoder = ContentLengthDecoder()
+        data = frame(b'{"id": 1}') + frame('{"text": "é中"}'.encode("UTF-8"))
+        messages = []
+        for i in range(0, len(data)):
+            messages.extend(decoder.feed(data[i:i + 1]))
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(json.loads(messages[1].decode("UTF-8")), {"text": "é中"})
+        self.assertEqual(decoder.pending(), 0)
+
+    def test_ignores_other_headers(self):
+        decoder = ContentLengthDecoder()
+        data = b"Content-Type: application/vscode-jsonrpc; charset=utf-8\r\nContent-Length: 2\r\n\r\n{}"
+        self.assertEqual(decoder.feed(data), [b"{}"])
+
+    def test_keeps_partial_message(self):
+        decoder = ContentLengthDecoder()
+        data = frame(b'{"id": 1}') + frame(b'{"id": 2}')
+        self.assertEqual(decoder.feed(data[:-3]), [b'{"id": 1}'])
+        self.assertGreater(decoder.pending(), 0)
+        self.assertEqual(decoder.feed(data[-3:]), [b'{"id": 2}'])
+
+    def test_decodes_large_message_in_chunks(self):
+        decoder = ContentLengthDecoder()
+        content = b"[" + b",".join(b'"item"' for _ in range(0, 200000)) + b"]"
+        data = frame(content) + frame(b"{}")
+        messages = []
+        for i in range(0, len(data), 4096):
+            messages.extend(decoder.feed(data[i:i + 4096]))
+        self.assertEqual(messages, [content, b"{}"])
+
+
+class WriterTests(unittest.TestCase):
+
+    def test_takes_all_queued_messages(self):
+        send_queue = PrioritySendQueue()
+        for message in (b"a", b"b", b"c"):
+            send_queue.put(message)
+        self.assertEqual(take_queued_messages(send_queue), ([b"a", b"b", b"c"], False))
+
+        send_queue.put(b"d")
+        send_queue.put(None)
+        self.assertEqual(take_queued_messages(send_queue), ([b"d"], True))
+
+    def test_limits_flush_size(self):
+        send_queue = PrioritySendQueue()
+        for message in (b"aaaa", b"bbbb", b"cc"):
+            send_queue.put(message)
+        self.assertEqual(take_queued_messages(send_queue, 8), ([b"aaaa", b"bbbb"], False))
+        self.assertEqual(take_queued_messages(send_queue, 8), ([b"cc"], False))
+
+    def test_coalesces_queued_messages_into_one_write(self):
+        client_socket, server_socket = socket.socketpair()
+        transport = TCPTransport(client_socket)
+        for i in range(0, 3):
+            transport.send(frame('{{"id": {}}}'.format(i).encode("ascii")))
+        transport.send_queue.put(None)
+        transport.write_socket()
+
+        self.assertEqual(transport.write_stats.flushes, 1)
+        self.assertEqual(transport.write_stats.messages, 3)
+        received = server_socket.recv(4096)
+        self.assertEqual(transport.write_stats.bytes, len(received))
+        self.assertEqual(ContentLengthDecoder().feed(received), [b'{"id": 0}', b'{"id": 1}', b'{"id": 2}'])
+        client_socket.close()
+        server_socket.close()
+
+
+class PrioritySendQueueTests(unittest.TestCase):
+
+    def take_all(self, send_queue):
+        messages = []
+        while True:
+            try:
+                messages.append(send_queue.get_nowait())
+            except Empty:
+                return messages
+
+    def test_takes_urgent_messages_first(self):
+        send_queue = PrioritySendQueue()
+        send_queue.put(b"open a", PRIORITY_BULK, "a")
+        send_queue.put(b"open b", PRIORITY_BULK, "b")
+        send_queue.put(b"hover c", PRIORITY_NORMAL, "c")
+        send_queue.put(b"change c", PRIORITY_INTERACTIVE, "c")
+        send_queue.put(b"complete d", PRIORITY_INTERACTIVE, "d")
+        self.assertEqual(self.take_all(send_queue), [b"complete d", b"hover c", b"change c", b"open a", b"open b"])
+
+    def test_removes_queued_messages(self):
+        send_queue = PrioritySendQueue()
+        hover = b"hover a"
+        send_queue.put(b"open a", PRIORITY_BULK, "a")
+        send_queue.put(hover, PRIORITY_NORMAL, "a")
+        self.assertTrue(send_queue.remove(hover))
+        self.assertFalse(send_queue.remove(hover))
+        self.assertEqual(self.take_all(send_queue), [b"open a"])
+        # the key no longer holds back urgent messages
+        send_queue.put(b"open b", PRIORITY_BULK, "b")
+        send_queue.put(b"change a", PRIORITY_INTERACTIVE, "a")
+        self.assertEqual(self.take_all(send_queue), [b"change a", b"open b"])
+
+    def test_keeps_order_per_key(self):
+        send_queue = PrioritySendQueue()
+        send_queue.put(b"open a", PRIORITY_BULK, "a")
+        send_queue.put(b"change a", PRIORITY_INTERACTIVE, "a")
+        send_queue.put(b"change b", PRIORITY_INTERACTIVE, "b")
+        send_queue.put(b"complete a", PRIORITY_INTERACTIVE, "a")
+        self.assertEqual(self.take_all(send_queue), [b"change b", b"open a", b"change a", b"complete a"])
+
+        # once the bulk message is taken, the key is no longer held back
+        send_queue.put(b"change a", PRIORITY_INTERACTIVE, "a")
+        send_queue.put(b"open c", PRIORITY_BULK, "c")
+        self.assertEqual(self.take_all(send_queue), [b"change a", b"open c"])
+
+    def test_returns_none_once_closed_and_drained(self):
+        send_queue = PrioritySendQueue()
+        send_queue.put(b"a")
+        send_queue.put(None)
+        self.assertEqual(send_queue.get(), b"a")
+        self.assertIsNone(send_queue.get())
+
+
+class ConnectTests(unittest.TestCase):
+
+    def unused_port(self):
+        sock = socket.socket()
+        sock.bind(("localhost", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        return port
+
+    def test_retries_until_server_listens(self):
+        port = self.unused_port()
+        server = socket.socket()
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        def listen():
+            server.bind(("localhost", port))
+            server.listen(1)
+
+        timer = threading.Timer(0.2, listen)
+        timer.start()
+        sock = connect_tcp(port)
+        timer.join()
+        sock.close()
+        server.close()
+
+    def test_waits_for_ready(self):
+        port = self.unused_port()
+        server = socket.socket()
+        ready = threading.Event()
+
+        def listen():
+            server.bind(("localhost", port))
+            server.listen(1)
+            ready.set()
+
+        timer = threading.Timer(0.1, listen)
+        timer.start()
+        sock = connect_tcp(port, ready=ready)
+        timer.join()
+        sock.close()
+        server.close()
+
+    def test_times_out(self):
+        with self.assertRaises(Exception):
+            connect_tcp(self.unused_port(), timeout=0.1)
@@ -63,6 +63,12 @@ class TestView(object):
     def score_selector(self, region, scope: str) -> int:
         return 1
 
+    def scope_name(self, point: int) -> str:
+        return "text.plain "
+
+    def id(self):
+        return 1
+
     def buffer_id(self):
         return 1
 
@@ -121,6 +127,12 @@ class TestWindow(object):
             else:
                 return self._default_view
 
+    def find_open_file(self, file_name: str) -> Optional[ViewLike]:
+        for view in self.views():
+            if view.file_name() == file_name:
+                return view
+        return None
+
     def add_view_in_group(self, group, view):
         self._files_in_groups[group].append(view)
 
@@ -196,6 +208,15 @@ class TestDocuments(object):
     def reset(self):
         self._documents = []
 
+    def handle_diagnostics(self, config_name: str, uri: str) -> None:
+        pass
+
+    def is_open(self, file_name: str, config_name: str) -> bool:
+        return file_name in self._documents
+
+    def debounce_windows(self) -> 'Dict[int, float]':
+        return {}
+
 
 class TestDocumentHandlerFactory(object):
     def for_window(self, window, configs):
@@ -382,3 +403,33 @@ class WindowManagerTests(unittest.TestCase):
 
         # client_start_listeners, client_initialization_listeners,
         self.assertTrue(test_config.name in dispatcher._initialized)
+
+    def test_caches_view_sessions_until_sessions_change(self):
+        view = TestView(__file__)
+        wm = WindowManager(TestWindow([[view]]), TestConfigs(), TestDocuments(),
+                           TestDiagnostics(), test_start_session, test_sublime, TestHandlerDispatcher())
+        self.assertIsNone(wm.session_for_view(view))
+
+        wm.start_active_views()
+        session = wm.get_session(test_config.name)
+        self.assertIsNotNone(session)
+        self.assertIs(wm.session_for_view(view), session)
+        self.assertIs(wm.session_for_view(view), session)
+        self.assertEqual(wm.view_session_stats()["hits"], 1)
+
+        # a different syntax is a different binding
+        view.settings().set("syntax", "Python")
+        wm.session_for_view(view)
+        self.assertEqual(wm.view_session_stats()["misses"], 3)
+
+        # lookups at a point resolve the scope there
+        self.assertIs(wm.session_for_view(view, 0), session)
+        self.assertEqual(wm.view_session_stats()["misses"], 3)
+
+        view.settings().set("syntax", "Plain Text")
+        # no requests about documents the session was never sent
+        unopened = TestView("/unopened.py")
+        self.assertIsNone(wm.session_for_view(unopened))
+
+        wm.end_session(test_config.name)
+        self.assertIsNone(wm.session_for_view(view))
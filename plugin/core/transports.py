@@ -1,20 +1,28 @@
 from abc import ABCMeta, abstractmethod
+import os
 import threading
 import time
 import socket
-from queue import Queue
+from collections import deque
+from queue import Empty
 import subprocess
 from .logging import exception_log, debug
+from .eventloop import event_loop, event_loop_enabled, set_non_blocking, EventLoop
+from .dispatch import receive_dispatcher
 
 try:
-    from typing import Callable, Dict, Any, Optional
-    assert Callable and Dict and Any and Optional and subprocess
+    from typing import Callable, Dict, Any, Optional, List, Tuple, Deque
+    assert Callable and Dict and Any and Optional and List and Tuple and Deque and subprocess
 except ImportError:
     pass
 
 
 ContentLengthHeader = b"Content-Length: "
 TCP_CONNECT_TIMEOUT = 5
+# Delays between connection attempts double from the first to the last, so a server
+# that is still starting is not polled in a busy loop.
+TCP_CONNECT_FIRST_RETRY_DELAY = 0.01
+TCP_CONNECT_MAX_RETRY_DELAY = 0.5
 
 try:
     from typing import Any, Dict, Callable
@@ -23,6 +31,16 @@ except ImportError:
     pass
 
 
+# Outgoing message priorities, most urgent first.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+
+# A flush stops taking queued messages beyond this many bytes, so a message queued
+# while a bulk flush is being written does not wait for every other bulk message too.
+MAX_FLUSH_BYTES = 1024 * 1024
+
+
 class Transport(object, metaclass=ABCMeta):
     @abstractmethod
     def __init__(self) -> None:
@@ -33,40 +51,237 @@ class Transport(object, metaclass=ABCMeta):
         pass
 
     @abstractmethod
-    def send(self, message: str) -> None:
+    def send(self, message: bytes, priority: int = PRIORITY_NORMAL, key: 'Optional[str]' = None) -> None:
         pass
 
+    def withdraw(self, message: bytes) -> bool:
+        """Takes back a message that was sent but not yet written, returning whether it was."""
+        return False
+
+
+class WriteStats(object):
+    """Counts what the writer thread pushed to the server, per flush and in total."""
+
+    def __init__(self) -> None:
+        self.flushes = 0
+        self.messages = 0
+        self.bytes = 0
+        self.last_flush_messages = 0
+        self.last_flush_bytes = 0
+
+    def record(self, messages: int, size: int) -> None:
+        self.flushes += 1
+        self.messages += messages
+        self.bytes += size
+        self.last_flush_messages = messages
+        self.last_flush_bytes = size
+
+
+class PrioritySendQueue(object):
+    """
+    Outgoing messages, taken most urgent priority first and in FIFO order within a priority.
+
+    Messages with the same key (the document they are about) are never reordered: a message
+    is queued no earlier than a less urgent message for the same key that is still queued.
+    Queueing None closes the queue; get returns None once the remaining messages are taken.
+    """
+
+    def __init__(self) -> None:
+        self._queues = [deque(), deque(), deque()]  # type: List[Deque[Tuple[bytes, Optional[str]]]]
+        self._queued_per_key = {}  # type: Dict[str, List[int]]
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put(self, message: 'Optional[bytes]', priority: int = PRIORITY_NORMAL, key: 'Optional[str]' = None) -> None:
+        with self._condition:
+            if message is None:
+                self._closed = True
+            else:
+                if key is not None:
+                    queued = self._queued_per_key.setdefault(key, [0, 0, 0])
+                    for less_urgent in range(PRIORITY_BULK, priority, -1):
+                        if queued[less_urgent]:
+                            priority = less_urgent
+                            break
+                    queued[priority] += 1
+                self._queues[priority].append((message, key))
+            self._condition.notify()
+
+    def get(self) -> 'Optional[bytes]':
+        with self._condition:
+            while not self._closed and not any(self._queues):
+                self._condition.wait()
+            return self._take()
+
+    def get_nowait(self) -> 'Optional[bytes]':
+        with self._condition:
+            if not self._closed and not any(self._queues):
+                raise Empty
+            return self._take()
+
+    def remove(self, message: bytes) -> bool:
+        """Removes a queued message (the same object that was put), returning whether it was queued."""
+        with self._condition:
+            for priority, queue in enumerate(self._queues):
+                for item in queue:
+                    if item[0] is message:
+                        queue.remove(item)
+                        self._forget(priority, item[1])
+                        return True
+            return False
+
+    def _take(self) -> 'Optional[bytes]':
+        for priority, queue in enumerate(self._queues):
+            if queue:
+                message, key = queue.popleft()
+                self._forget(priority, key)
+                return message
+        return None
+
+    def _forget(self, priority: int, key: 'Optional[str]') -> None:
+        if key is not None:
+            queued = self._queued_per_key[key]
+            queued[priority] -= 1
+            if not any(queued):
+                del self._queued_per_key[key]
+
+
+def take_queued_messages(send_queue: 'Any', limit: int = MAX_FLUSH_BYTES,
+                         block: bool = True) -> 'Tuple[List[bytes], bool]':
+    """
+    Waits for a message (unless block is False), then takes the other messages queued by then,
+    up to limit bytes.
+
+    Returns the messages and whether the queue was closed (a None was queued).
+    """
+    messages = []  # type: List[bytes]
+    size = 0
+    try:
+        message = send_queue.get() if block else send_queue.get_nowait()
+    except Empty:
+        return messages, False
+    while message is not None:
+        messages.append(message)
+        size += len(message)
+        if size >= limit:
+            return messages, False
+        try:
+            message = send_queue.get_nowait()
+        except Empty:
+            return messages, False
+    return messages, True
+
+
+def join_messages(messages: 'List[bytes]') -> bytes:
+    return messages[0] if len(messages) == 1 else b"".join(messages)
+
 
-STATE_HEADERS = 0
-STATE_CONTENT = 1
+READ_CHUNK_SIZE = 65536
 
 
-def start_tcp_transport(port: int, host: 'Optional[str]'=None) -> 'Transport':
+class ContentLengthDecoder(object):
+    """
+    Incremental decoder for Content-Length framed messages.
+
+    Received chunks are appended to a single bytearray and consumed by moving a
+    read offset, so the cost of decoding a message is linear in its size no
+    matter how many reads it arrived in.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._offset = 0
+        self._scanned = 0  # position up to which no header terminator was found
+        self._content_length = -1  # -1 while reading headers
+
+    def feed(self, data: bytes) -> 'List[bytes]':
+        """Appends data and returns the payloads of all messages completed by it."""
+        self._buffer.extend(data)
+        messages = []  # type: List[bytes]
+        while True:
+            if self._content_length < 0:
+                if not self._parse_headers():
+                    break
+            end = self._offset + self._content_length
+            if len(self._buffer) < end:
+                break
+            with memoryview(self._buffer) as view:
+                messages.append(bytes(view[self._offset:end]))
+            self._offset = end
+            self._scanned = end
+            self._content_length = -1
+        self._compact()
+        return messages
+
+    def pending(self) -> int:
+        """Number of received bytes not yet returned as part of a message."""
+        return len(self._buffer) - self._offset
+
+    def _parse_headers(self) -> bool:
+        # resume the terminator search where the previous one left off.
+        start = max(self._offset, self._scanned - 3)
+        header_end = self._buffer.find(b"\r\n\r\n", start)
+        if header_end < 0:
+            self._scanned = len(self._buffer)
+            return False
+        content_length = 0
+        for header in bytes(self._buffer[self._offset:header_end]).split(b"\r\n"):
+            if header.startswith(ContentLengthHeader):
+                content_length = int(header[len(ContentLengthHeader):])
+        self._offset = header_end + 4
+        self._content_length = content_length
+        return True
+
+    def _compact(self) -> None:
+        # drop consumed bytes once they make up most of the buffer, which keeps
+        # the memmove cost amortized over the bytes that were consumed.
+        if self._offset and self._offset * 2 >= len(self._buffer):
+            del self._buffer[:self._offset]
+            self._scanned = max(0, self._scanned - self._offset)
+            self._offset = 0
+
+
+def connect_tcp(port: int, host: 'Optional[str]'=None, ready: 'Optional[threading.Event]'=None,
+                timeout: float=TCP_CONNECT_TIMEOUT) -> 'Any':
+    """
+    Connects to a server that may still be starting, retrying with a growing delay.
+
+    When ready is given, the first attempt waits for it to be set (or for the timeout).
+    """
     start_time = time.time()
     debug('connecting to {}:{}'.format(host or "localhost", port))
+    if ready:
+        ready.wait(timeout)
 
-    while time.time() - start_time < TCP_CONNECT_TIMEOUT:
+    delay = TCP_CONNECT_FIRST_RETRY_DELAY
+    while True:
         try:
-            sock = socket.create_connection((host or "localhost", port))
-            return TCPTransport(sock)
-        except ConnectionRefusedError as e:
-            pass
+            return socket.create_connection((host or "localhost", port))
+        except ConnectionRefusedError:
+            remaining = timeout - (time.time() - start_time)
+            if remaining <= 0:
+                raise Exception("Timeout connecting to socket")
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, TCP_CONNECT_MAX_RETRY_DELAY)
 
-    # process.kill()
-    raise Exception("Timeout connecting to socket")
+
+def start_tcp_transport(port: int, host: 'Optional[str]'=None,
+                        ready: 'Optional[threading.Event]'=None) -> 'Transport':
+    return create_tcp_transport(connect_tcp(port, host, ready))
 
 
 class TCPTransport(Transport):
     def __init__(self, socket: 'Any') -> None:
         self.socket = socket  # type: 'Optional[Any]'
-        self.send_queue = Queue()  # type: Queue[Optional[str]]
+        self.send_queue = PrioritySendQueue()
+        self.write_stats = WriteStats()
 
     def start(self, on_receive: 'Callable[[str], None]', on_closed: 'Callable[[], None]') -> None:
         self.on_receive = on_receive
         self.on_closed = on_closed
-        self.read_thread = threading.Thread(target=self.read_socket)
+        self.read_thread = threading.Thread(target=self.read_socket, daemon=True)
         self.read_thread.start()
-        self.write_thread = threading.Thread(target=self.write_socket)
+        self.write_thread = threading.Thread(target=self.write_socket, daemon=True)
         self.write_thread.start()
 
     def close(self) -> None:
@@ -75,14 +290,10 @@ class TCPTransport(Transport):
         self.on_closed()
 
     def read_socket(self) -> None:
-        remaining_data = b""
-        is_incomplete = False
-        read_state = STATE_HEADERS
-        content_length = 0
+        decoder = ContentLengthDecoder()
         while self.socket:
-            is_incomplete = False
             try:
-                received_data = self.socket.recv(4096)
+                received_data = self.socket.recv(READ_CHUNK_SIZE)
             except Exception as err:
                 exception_log("Failure reading from socket", err)
                 self.close()
@@ -93,61 +304,50 @@ class TCPTransport(Transport):
                 self.close()
                 break
 
-            data = remaining_data + received_data
-            remaining_data = b""
-
-            while len(data) > 0 and not is_incomplete:
-                if read_state == STATE_HEADERS:
-                    headers, _sep, rest = data.partition(b"\r\n\r\n")
-                    if len(_sep) < 1:
-                        is_incomplete = True
-                        remaining_data = data
-                    else:
-                        for header in headers.split(b"\r\n"):
-                            if header.startswith(ContentLengthHeader):
-                                header_value = header[len(ContentLengthHeader):]
-                                content_length = int(header_value)
-                                read_state = STATE_CONTENT
-                        data = rest
-
-                if read_state == STATE_CONTENT:
-                    # read content bytes
-                    if len(data) >= content_length:
-                        content = data[:content_length]
-                        self.on_receive(content.decode("UTF-8"))
-                        data = data[content_length:]
-                        read_state = STATE_HEADERS
-                    else:
-                        is_incomplete = True
-                        remaining_data = data
-
-    def send(self, message: str) -> None:
-        self.send_queue.put(message)
+            for content in decoder.feed(received_data):
+                self.on_receive(content.decode("UTF-8"))
+
+    def send(self, message: bytes, priority: int = PRIORITY_NORMAL, key: 'Optional[str]' = None) -> None:
+        self.send_queue.put(message, priority, key)
+
+    def withdraw(self, message: bytes) -> bool:
+        return self.send_queue.remove(message)
 
     def write_socket(self) -> None:
         while self.socket:
-            message = self.send_queue.get()
-            if message is None:
-                break
-            else:
+            messages, closing = take_queued_messages(self.send_queue)
+            if messages and self.socket:
+                data = join_messages(messages)
                 try:
-                    self.socket.sendall(bytes(message, 'UTF-8'))
+                    self.socket.sendall(data)
+                    self.write_stats.record(len(messages), len(data))
                 except Exception as err:
                     exception_log("Failure writing to socket", err)
                     self.close()
+            if closing:
+                break
+
+
+def stdio_fds(process: 'subprocess.Popen') -> 'Tuple[int, int]':
+    """The file descriptors of a server process' stdout and stdin pipes."""
+    if process.stdout is None or process.stdin is None:
+        raise ValueError("server process has no stdin and stdout pipes")
+    return process.stdout.fileno(), process.stdin.fileno()
 
 
 class StdioTransport(Transport):
     def __init__(self, process: 'subprocess.Popen') -> None:
         self.process = process  # type: Optional[subprocess.Popen]
-        self.send_queue = Queue()  # type: Queue[Optional[str]]
+        self.read_fd, _ = stdio_fds(process)
+        self.send_queue = PrioritySendQueue()
+        self.write_stats = WriteStats()
 
     def start(self, on_receive: 'Callable[[str], None]', on_closed: 'Callable[[], None]') -> None:
         self.on_receive = on_receive
         self.on_closed = on_closed
-        self.write_thread = threading.Thread(target=self.write_stdin)
+        self.write_thread = threading.Thread(target=self.write_stdin, daemon=True)
         self.write_thread.start()
-        self.read_thread = threading.Thread(target=self.read_stdout)
+        self.read_thread = threading.Thread(target=self.read_stdout, daemon=True)
         self.read_thread.start()
 
     def close(self) -> None:
@@ -159,47 +359,200 @@ class StdioTransport(Transport):
         """
         Reads JSON responses from process and dispatch them to response_handler
         """
-        ContentLengthHeader = b"Content-Length: "
-
-        running = True
-        while running and self.process:
-            running = self.process.poll() is None
-
+        decoder = ContentLengthDecoder()
+        while self.process:
             try:
-                content_length = 0
-                while self.process:
-                    header = self.process.stdout.readline()
-                    if header:
-                        header = header.strip()
-                    if not header:
-                        break
-                    if header.startswith(ContentLengthHeader):
-                        content_length = int(header[len(ContentLengthHeader):])
-
-                if (content_length > 0):
-                    content = self.process.stdout.read(content_length)
-
-                    self.on_receive(content.decode("UTF-8"))
-
-            except IOError as err:
+                # returns whatever is available (up to READ_CHUNK_SIZE) without
+                # waiting for the full amount, so small messages are not delayed.
+                received_data = os.read(self.read_fd, READ_CHUNK_SIZE)
+            except (IOError, ValueError) as err:
                 self.close()
                 exception_log("Failure reading stdout", err)
                 break
 
+            if not received_data:
+                break
+
+            for content in decoder.feed(received_data):
+                self.on_receive(content.decode("UTF-8"))
+
         debug("LSP stdout process ended.")
 
-    def send(self, message: str) -> None:
-        self.send_queue.put(message)
+    def send(self, message: bytes, priority: int = PRIORITY_NORMAL, key: 'Optional[str]' = None) -> None:
+        self.send_queue.put(message, priority, key)
+
+    def withdraw(self, message: bytes) -> bool:
+        return self.send_queue.remove(message)
 
     def write_stdin(self) -> None:
         while self.process:
-            message = self.send_queue.get()
-            if message is None:
-                break
-            else:
+            messages, closing = take_queued_messages(self.send_queue)
+            if messages and self.process:
+                data = join_messages(messages)
                 try:
-                    self.process.stdin.write(bytes(message, 'UTF-8'))
+                    self.process.stdin.write(data)
                     self.process.stdin.flush()
+                    self.write_stats.record(len(messages), len(data))
                 except (BrokenPipeError, OSError) as err:
                     exception_log("Failure writing to stdout", err)
                     self.close()
+            if closing:
+                break
+
+
+class EventLoopTransport(Transport):
+    """
+    Reads and writes a language server's descriptors from the shared event loop instead of
+    dedicated threads. Writes are non-blocking; the unwritten rest of a flush is kept until
+    the descriptor is writable again.
+
+    Received messages and the close are handed to the dispatcher in order, so handling them
+    never holds up the loop and the other servers on it.
+    """
+
+    def __init__(self, loop: EventLoop, read_fd: int, write_fd: int, dispatcher: 'Any' = None) -> None:
+        self.loop = loop
+        self.dispatcher = dispatcher or receive_dispatcher
+        self.read_fd = read_fd
+        self.write_fd = write_fd
+        self.send_queue = PrioritySendQueue()
+        self.write_stats = WriteStats()
+        self._decoder = ContentLengthDecoder()
+        self._unsent = b""
+        self._unsent_offset = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def start(self, on_receive: 'Callable[[str], None]', on_closed: 'Callable[[], None]') -> None:
+        self.on_receive = on_receive
+        self.on_closed = on_closed
+        self.loop.add_reader(self.read_fd, self._on_readable)
+        self.loop.add_writer(self.write_fd, self._on_writable)
+
+    def send(self, message: bytes, priority: int = PRIORITY_NORMAL, key: 'Optional[str]' = None) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self.send_queue.put(message, priority, key)
+            self.loop.add_writer(self.write_fd, self._on_writable)
+
+    def withdraw(self, message: bytes) -> bool:
+        with self._lock:
+            return self.send_queue.remove(message)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self.loop.remove_reader(self.read_fd)
+        self.loop.remove_writer(self.write_fd)
+        self.dispatcher.dispatch(id(self), self.on_closed)
+
+    @abstractmethod
+    def read(self) -> bytes:
+        pass
+
+    @abstractmethod
+    def write(self, data: 'memoryview') -> int:
+        pass
+
+    def on_eof(self) -> None:
+        self.close()
+
+    def _on_readable(self) -> None:
+        try:
+            received_data = self.read()
+        except BlockingIOError:
+            return
+        except (OSError, ValueError) as err:
+            exception_log("Failure reading from language server", err)
+            self.close()
+            return
+
+        if not received_data:
+            self.loop.remove_reader(self.read_fd)
+            self.on_eof()
+            return
+
+        for content in self._decoder.feed(received_data):
+            self._dispatch_receive(content)
+
+    def _dispatch_receive(self, content: bytes) -> None:
+        self.dispatcher.dispatch(id(self), lambda: self.on_receive(content.decode("UTF-8")))
+
+    def _on_writable(self) -> None:
+        if not self._unsent:
+            with self._lock:
+                messages, _ = take_queued_messages(self.send_queue, block=False)
+                if not messages:
+                    # nothing left to send; send() adds the writer again for the next message.
+                    self.loop.remove_writer(self.write_fd)
+                    return
+            self._unsent = join_messages(messages)
+            self._unsent_offset = 0
+            self.write_stats.record(len(messages), len(self._unsent))
+
+        try:
+            self._unsent_offset += self.write(memoryview(self._unsent)[self._unsent_offset:])
+        except BlockingIOError:
+            return
+        except OSError as err:
+            exception_log("Failure writing to language server", err)
+            self._unsent = b""
+            self.close()
+            return
+        if self._unsent_offset >= len(self._unsent):
+            self._unsent = b""
+
+
+class EventLoopTCPTransport(EventLoopTransport):
+    def __init__(self, socket: 'Any', loop: EventLoop = event_loop) -> None:
+        socket.setblocking(False)
+        super().__init__(loop, socket.fileno(), socket.fileno())
+        self.socket = socket
+
+    def read(self) -> bytes:
+        return self.socket.recv(READ_CHUNK_SIZE)
+
+    def write(self, data: 'memoryview') -> int:
+        return self.socket.send(data)
+
+    def on_eof(self) -> None:
+        debug("no data received, closing")
+        self.close()
+
+    def close(self) -> None:
+        super().close()
+        self.socket.close()
+
+
+class EventLoopStdioTransport(EventLoopTransport):
+    def __init__(self, process: 'subprocess.Popen', loop: EventLoop = event_loop) -> None:
+        read_fd, write_fd = stdio_fds(process)
+        set_non_blocking(read_fd)
+        set_non_blocking(write_fd)
+        super().__init__(loop, read_fd, write_fd)
+        self.process = process
+
+    def read(self) -> bytes:
+        return os.read(self.read_fd, READ_CHUNK_SIZE)
+
+    def write(self, data: 'memoryview') -> int:
+        return os.write(self.write_fd, data)
+
+    def on_eof(self) -> None:
+        # like the threaded transport, leave closing to the failing write or the process owner.
+        debug("LSP stdout process ended.")
+
+
+def create_tcp_transport(socket: 'Any') -> Transport:
+    if event_loop_enabled():
+        return EventLoopTCPTransport(socket)
+    return TCPTransport(socket)
+
+
+def create_stdio_transport(process: 'subprocess.Popen') -> Transport:
+    if event_loop_enabled():
+        return EventLoopStdioTransport(process)
+    return StdioTransport(process)
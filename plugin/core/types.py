@@ -17,6 +17,8 @@ class Settings(object):
         self.show_diagnostics_count_in_view_status = False
         self.show_diagnostics_in_view_status = True
         self.show_diagnostics_severity_level = 3
+        self.diagnostics_max_per_file = 1000
+        self.diagnostics_max_per_window = 20000
         self.only_show_lsp_completions = False
         self.diagnostics_highlight_style = "underline"
         self.highlight_active_signature_parameter = True
@@ -32,6 +34,13 @@ class Settings(object):
         self.completion_hint_type = "auto"
         self.complete_using_text_edit = False
         self.resolve_completion_for_snippets = False
+        self.transport_event_loop = False
+        self.lazy_background_documents = False
+        self.large_file_size = 5000000
+        self.large_file_line_length = 20000
+        self.large_file_policy = "read_only"
+        self.document_sync_debounce_min = 100
+        self.document_sync_debounce_max = 1000
         self.log_debug = True
         self.log_server = True
         self.log_stderr = False
@@ -55,11 +64,13 @@ class ClientConfig(object):
     def __init__(self, name: str, binary_args: 'List[str]', tcp_port: 'Optional[int]', scopes=[],
                  syntaxes=[], languageId: 'Optional[str]'=None,
                  languages: 'List[LanguageConfig]'=[], enabled: bool=True, init_options=dict(),
-                 settings=dict(), env=dict(), tcp_host: 'Optional[str]'=None) -> None:
+                 settings=dict(), env=dict(), tcp_host: 'Optional[str]'=None,
+                 tcp_ready_pattern: 'Optional[str]'=None) -> None:
         self.name = name
         self.binary_args = binary_args
         self.tcp_port = tcp_port
         self.tcp_host = tcp_host
+        self.tcp_ready_pattern = tcp_ready_pattern
         if not languages:
             languages = [LanguageConfig(languageId, scopes, syntaxes)] if languageId else []
         self.languages = languages
@@ -100,6 +111,12 @@ class ViewLike(Protocol):
     def score_selector(self, region, scope: str) -> int:
         ...
 
+    def scope_name(self, point: int) -> str:
+        ...
+
+    def id(self) -> int:
+        ...
+
 
 class WindowLike(Protocol):
     def id(self) -> int:
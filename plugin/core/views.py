@@ -1,5 +1,22 @@
 import sublime
 from .protocol import Point, Range
+from .lineindex import LineIndex, utf16_to_offset, offset_to_utf16
+from .cache import MeasuredCache
+
+try:
+    from typing import Dict, Iterable, List, Tuple
+    assert Dict and Iterable and List and Tuple
+except ImportError:
+    pass
+
+
+# line indexes of recently converted buffers, keyed by buffer and change count so edits
+# give a new index.
+_line_indexes = MeasuredCache(limit=8)
+
+# Fewer ranges than this are converted by reading only the lines they are on, as building a
+# line index reads the whole buffer.
+LINE_INDEX_THRESHOLD = 50
 
 
 def point_to_offset(point: Point, view: sublime.View) -> int:
@@ -19,3 +36,38 @@ def region_to_range(view: sublime.View, region: sublime.Region) -> 'Range':
         offset_to_point(view, region.begin()),
         offset_to_point(view, region.end())
     )
+
+
+def utf16_position(view: sublime.View, offset: int) -> 'Tuple[int, int]':
+    """The row and the column in UTF-16 code units, as in LSP, of an offset."""
+    row, col = view.rowcol(offset)
+    line = view.substr(view.line(offset))
+    return row, offset_to_utf16(line, col)
+
+
+def _line_offset(view: sublime.View, lines: 'Dict[int, Tuple[int, str]]', row: int, character: int) -> int:
+    line = lines.get(row)
+    if line is None:
+        start = view.text_point(row, 0)
+        line = (start, view.substr(view.line(start)))
+        lines[row] = line
+    return line[0] + utf16_to_offset(line[1], character)
+
+
+def line_index(view: sublime.View) -> LineIndex:
+    """The line index of the view's current content, built from one read of its text."""
+    key = (view.buffer_id(), view.change_count())
+    return _line_indexes.get(key, lambda: LineIndex(view.substr(sublime.Region(0, view.size()))))
+
+
+def ranges_to_regions(ranges: 'Iterable[Range]', view: sublime.View) -> 'List[sublime.Region]':
+    """
+    Regions of ranges, with columns in UTF-16 code units. Many ranges are converted through
+    the view's line index, few by reading only the lines they are on.
+    """
+    ranges = list(ranges)
+    if len(ranges) < LINE_INDEX_THRESHOLD:
+        lines = {}  # type: Dict[int, Tuple[int, str]]
+        return [sublime.Region(_line_offset(view, lines, r.start.row, r.start.col),
+                               _line_offset(view, lines, r.end.row, r.end.col)) for r in ranges]
+    return [sublime.Region(a, b) for a, b in line_index(view).ranges_to_offsets(ranges)]
@@ -1,16 +1,23 @@
-import re
+import time
+from collections import deque
 from .events import global_events
 from .logging import debug
 from .types import ClientStates, ClientConfig, WindowLike, ViewLike, LanguageConfig
 from .protocol import Notification
 from .sessions import Session
+from .syntaxes import config_supports_syntax
+from .sync import content_change, content_fingerprint, text_sync_kind
+from .protocol import TextDocumentSyncKindIncremental
+from .debounce import AdaptiveDebounce
+from .cache import MeasuredCache
+from .largefile import large_file_reason
 from .url import filename_to_uri
 from .workspace import get_project_path
 try:
     from typing_extensions import Protocol
-    from typing import Optional, List, Callable, Dict, Any
+    from typing import Optional, List, Callable, Dict, Any, Tuple, Deque
     from types import ModuleType
-    assert Optional and List and Callable and Dict and Session and Any and ModuleType
+    assert Optional and List and Callable and Dict and Session and Any and ModuleType and Tuple and Deque
     assert LanguageConfig
 except ImportError:
     pass
@@ -66,6 +73,15 @@ class DocumentHandler(Protocol):
     def reset(self) -> None:
         ...
 
+    def handle_diagnostics(self, config_name: str, uri: str) -> None:
+        ...
+
+    def is_open(self, file_name: str, config_name: str) -> bool:
+        ...
+
+    def debounce_windows(self) -> 'Dict[int, float]':
+        ...
+
 
 def get_active_views(window: WindowLike):
     views = list()  # type: List[ViewLike]
@@ -80,16 +96,42 @@ def get_active_views(window: WindowLike):
     return views
 
 
+# Delay between opening background documents in a newly started session, in milliseconds.
+BACKGROUND_OPEN_DELAY = 50
+
+
 class DocumentState:
     """Stores version count for documents open in a language service"""
     def __init__(self, path: str) -> 'None':
         self.path = path
         self.version = 0
+        # what each session last received: a fingerprint of the content, and for sessions that
+        # sync incrementally the text itself, which the next change is computed against.
+        self.fingerprints = {}  # type: Dict[str, Tuple[int, int]]
+        self.synced_text = {}  # type: Dict[str, str]
+        # set for documents over the large file thresholds
+        self.large_file_policy = None  # type: Optional[str]
 
     def inc_version(self):
         self.version += 1
         return self.version
 
+    def is_open(self, config_name: str) -> bool:
+        return config_name in self.fingerprints
+
+    def forget_session(self, config_name: str) -> None:
+        self.fingerprints.pop(config_name, None)
+        self.synced_text.pop(config_name, None)
+
+    def is_synced(self, config_name: str, fingerprint: 'Tuple[int, int]') -> bool:
+        return self.fingerprints.get(config_name) == fingerprint
+
+    def set_synced(self, session: Session, text: str, fingerprint: 'Tuple[int, int]') -> None:
+        config_name = session.config.name
+        self.fingerprints[config_name] = fingerprint
+        if text_sync_kind(session.capabilities) == TextDocumentSyncKindIncremental:
+            self.synced_text[config_name] = text
+
 
 class DocumentHandlerFactory(object):
     def __init__(self, sublime, settings):
@@ -100,13 +142,6 @@ class DocumentHandlerFactory(object):
         return WindowDocumentHandler(self._sublime, self._settings, window, global_events, configs)
 
 
-def config_supports_syntax(config: 'ClientConfig', syntax: str) -> bool:
-    for language in config.languages:
-        if re.search(r'|'.join(r'\b%s\b' % re.escape(s) for s in language.syntaxes), syntax, re.IGNORECASE):
-            return True
-    return False
-
-
 class WindowDocumentHandler(object):
     def __init__(self, sublime, settings, window, events, configs):
         self._sublime = sublime
@@ -116,6 +151,10 @@ class WindowDocumentHandler(object):
         self._document_states = dict()  # type: Dict[str, DocumentState]
         self._pending_buffer_changes = dict()  # type: Dict[int, Dict]
         self._sessions = dict()  # type: Dict[str, Session]
+        # documents each new session has yet to be sent, least important last.
+        self._background_opens = dict()  # type: Dict[str, Deque[str]]
+        self._debounce = AdaptiveDebounce(settings.document_sync_debounce_min / 1000,
+                                          settings.document_sync_debounce_max / 1000)
         events.subscribe('view.on_load_async', self.handle_view_opened)
         events.subscribe('view.on_activated_async', self.handle_view_opened)
         events.subscribe('view.on_modified', self.handle_view_modified)
@@ -130,6 +169,9 @@ class WindowDocumentHandler(object):
     def remove_session(self, config_name: str):
         if config_name in self._sessions:
             del self._sessions[config_name]
+        self._background_opens.pop(config_name, None)
+        for document_state in self._document_states.values():
+            document_state.forget_session(config_name)
 
     def reset(self) -> None:
         for view in self._window.views():
@@ -144,6 +186,11 @@ class WindowDocumentHandler(object):
     def has_document_state(self, path: str) -> bool:
         return path in self._document_states
 
+    def is_open(self, file_name: str, config_name: str) -> bool:
+        """Whether the document was opened in the session, so requests about it can be sent."""
+        document_state = self._document_states.get(file_name)
+        return document_state is not None and document_state.is_open(config_name)
+
     def _get_applicable_sessions(self, view: ViewLike):
         sessions = []  # type: List[Session]
         syntax = view.settings().get("syntax")
@@ -153,14 +200,55 @@ class WindowDocumentHandler(object):
         return sessions
 
     def _notify_open_documents(self, session: Session) -> None:
-        for file_name in self._document_states:
-            view = self._window.find_open_file(file_name)
-            if view:
-                syntax = view.settings().get("syntax")
-                if config_supports_syntax(session.config, syntax):
-                    sessions = self._get_applicable_sessions(view)
-                    self._attach_view(view, sessions)
-                    self._notify_did_open(view, session)
+        """
+        Opens the tracked documents in a new session: the visible views right away, active
+        group first, and the background views one at a time, or when they are activated if
+        lazy_background_documents is set.
+        """
+        visible = [view.file_name() for view in get_active_views(self._window) if view]
+        file_names = [file_name for file_name in visible if file_name in self._document_states]
+        file_names.extend(file_name for file_name in self._document_states if file_name not in visible)
+
+        background = deque()  # type: Deque[str]
+        for file_name in file_names:
+            if file_name in visible:
+                self._open_in_session(file_name, session)
+            else:
+                background.append(file_name)
+
+        if background:
+            self._background_opens[session.config.name] = background
+            if not self._settings.lazy_background_documents:
+                self._sublime.set_timeout_async(lambda: self._open_next_background(session), BACKGROUND_OPEN_DELAY)
+
+    def _open_next_background(self, session: Session) -> None:
+        if self._sessions.get(session.config.name) is not session:
+            return  # the session ended in the meantime
+        background = self._background_opens.get(session.config.name)
+        while background:
+            if self._open_in_session(background.popleft(), session):
+                break
+        if background:
+            self._sublime.set_timeout_async(lambda: self._open_next_background(session), BACKGROUND_OPEN_DELAY)
+        else:
+            self._background_opens.pop(session.config.name, None)
+
+    def _open_in_session(self, file_name: str, session: Session) -> bool:
+        """
+        Sends didOpen if the document is still open and tracked, and not yet sent to the session.
+        Returns whether it was sent.
+        """
+        document_state = self._document_states.get(file_name)
+        if not document_state or document_state.is_open(session.config.name):
+            return False
+        view = self._window.find_open_file(file_name)
+        if view:
+            syntax = view.settings().get("syntax")
+            if config_supports_syntax(session.config, syntax):
+                sessions = self._get_applicable_sessions(view)
+                self._attach_view(view, sessions)
+                return self._notify_did_open(view, session)
+        return False
 
     def _is_supported_view(self, view: ViewLike) -> bool:
         return self._configs.syntax_supported(view)
@@ -190,11 +278,20 @@ class WindowDocumentHandler(object):
     def handle_view_opened(self, view: ViewLike):
         file_name = view.file_name()
         if file_name and view.window() == self._window:
-            if not self.has_document_state(file_name):
+            if self.has_document_state(file_name):
+                # a background document that was not sent to a new session yet
+                for session in self._get_applicable_sessions(view):
+                    if not self._document_states[file_name].is_open(session.config.name):
+                        self._notify_did_open(view, session)
+            else:
                 config_languages = self._config_languages(view)
                 if len(config_languages) > 0:
+                    large_file_policy = self._large_file_policy(view)
+                    if large_file_policy == "skip":
+                        return
+
                     # always register a supported document
-                    self.get_document_state(file_name)
+                    self.get_document_state(file_name).large_file_policy = large_file_policy
                     self._set_view_languages(view, config_languages)
 
                     # the sessions may not be available yet,
@@ -204,25 +301,54 @@ class WindowDocumentHandler(object):
                     for session in sessions:
                         self._notify_did_open(view, session)
 
-    def _notify_did_open(self, view: ViewLike, session: Session) -> None:
+    def _large_file_policy(self, view: ViewLike) -> 'Optional[str]':
+        """
+        The large file policy that applies to a view, if it is over the large file thresholds.
+        The view is marked with the policy, so features can leave it alone.
+        """
+        policy = view.settings().get("lsp_large_file")
+        if policy:
+            return policy
+        reason = large_file_reason(view.size(), lambda: view.substr(self._sublime.Region(0, view.size())),
+                                   self._settings.large_file_size, self._settings.large_file_line_length)
+        if reason:
+            policy = self._settings.large_file_policy
+            debug('large file policy', policy, 'applies to', view.file_name(), '-', reason)
+            view.settings().set("lsp_large_file", policy)
+            view.settings().set("lsp_large_file_reason", reason)
+            view.set_status("lsp_large_file", "LSP: large file ({})".format(policy.replace("_", " ")))
+        return policy
+
+    def _notify_did_open(self, view: ViewLike, session: Session) -> bool:
+        """Sends didOpen, unless the large file policy keeps the document from the session."""
         file_name = view.file_name()
         if file_name:
             ds = self.get_document_state(file_name)
+            if ds.large_file_policy == "incremental" and \
+                    text_sync_kind(session.capabilities) != TextDocumentSyncKindIncremental:
+                return False
+            text = view.substr(self._sublime.Region(0, view.size()))
+            ds.set_synced(session, text, content_fingerprint(text))
             params = {
                 "textDocument": {
                     "uri": filename_to_uri(file_name),
                     "languageId": self._view_language(view, session.config.name),
-                    "text": view.substr(self._sublime.Region(0, view.size())),
+                    "text": text,
                     "version": ds.version
                 }
             }
             session.client.send_notification(Notification.didOpen(params))
+            return True
+        return False
 
     def handle_view_closed(self, view: ViewLike):
         file_name = view.file_name()
+        self._debounce.forget(view.buffer_id())
         if file_name in self._document_states:
-            del self._document_states[file_name]
+            document_state = self._document_states.pop(file_name)
             for session in self._get_applicable_sessions(view):
+                if not document_state.is_open(session.config.name):
+                    continue
                 debug('closing', file_name, session.config.name)
                 if session.client:
                     params = {"textDocument": {"uri": filename_to_uri(file_name)}}
@@ -232,8 +358,9 @@ class WindowDocumentHandler(object):
         file_name = view.file_name()
         if view.window() == self._window:
             if file_name in self._document_states:
+                document_state = self._document_states[file_name]
                 for session in self._get_applicable_sessions(view):
-                    if session.client:
+                    if session.client and document_state.is_open(session.config.name):
                         params = {"textDocument": {"uri": filename_to_uri(file_name)}}
                         session.client.send_notification(Notification.didSave(params))
             else:
@@ -242,6 +369,7 @@ class WindowDocumentHandler(object):
     def handle_view_modified(self, view: ViewLike):
         if view.window() == self._window:
             buffer_id = view.buffer_id()
+            self._debounce.on_modified(buffer_id, time.time())
             buffer_version = 1
             pending_buffer = None
             if buffer_id in self._pending_buffer_changes:
@@ -254,8 +382,22 @@ class WindowDocumentHandler(object):
                     "version": buffer_version
                 }
 
+            window = self._debounce.window(buffer_id, self._server_turnarounds(view))
             self._sublime.set_timeout_async(
-                lambda: self.purge_did_change(buffer_id, buffer_version), 500)
+                lambda: self.purge_did_change(buffer_id, buffer_version), int(window * 1000))
+
+    def debounce_windows(self) -> 'Dict[int, float]':
+        """The didChange debounce last chosen for each buffer, in seconds."""
+        return dict(self._debounce.windows)
+
+    def _server_turnarounds(self, view: ViewLike) -> 'List[Optional[float]]':
+        """How long the applicable servers take from a didChange to its diagnostics."""
+        return [self._debounce.turnaround(session.config.name) for session in self._get_applicable_sessions(view)]
+
+    def handle_diagnostics(self, config_name: str, uri: str) -> None:
+        # called from dispatcher workers, so the debounce is updated on the thread sending didChange.
+        received = time.time()
+        self._sublime.set_timeout_async(lambda: self._debounce.on_diagnostics(config_name, uri, received), 0)
 
     def purge_changes(self, view: ViewLike):
         self.purge_did_change(view.buffer_id())
@@ -275,22 +417,34 @@ class WindowDocumentHandler(object):
         if file_name and view.window() == self._window:
             if view.buffer_id() in self._pending_buffer_changes:
                 del self._pending_buffer_changes[view.buffer_id()]
+                if self.get_document_state(file_name).large_file_policy == "read_only":
+                    return
 
+                text = view.substr(self._sublime.Region(0, view.size()))
+                fingerprint = content_fingerprint(text)
                 for session in self._get_applicable_sessions(view):
                     if session.client:
                         document_state = self.get_document_state(file_name)
+                        config_name = session.config.name
+                        if not document_state.is_open(config_name):
+                            continue  # not sent to this session yet, didOpen will carry the text
+                        if document_state.is_synced(config_name, fingerprint):
+                            debug('skipping didChange, content unchanged for', config_name)
+                            continue
+                        change = content_change(document_state.synced_text.get(config_name), text,
+                                                text_sync_kind(session.capabilities))
+                        document_state.set_synced(session, text, fingerprint)
                         uri = filename_to_uri(file_name)
                         params = {
                             "textDocument": {
                                 "uri": uri,
-                                "languageId": self._view_language(view, session.config.name),
+                                "languageId": self._view_language(view, config_name),
                                 "version": document_state.inc_version(),
                             },
-                            "contentChanges": [{
-                                "text": view.substr(self._sublime.Region(0, view.size()))
-                            }]
+                            "contentChanges": [change]
                         }
                         session.client.send_notification(Notification.didChange(params))
+                        self._debounce.on_sent(config_name, uri, time.time())
 
 
 class WindowManager(object):
@@ -312,10 +466,54 @@ class WindowManager(object):
         self._project_path = get_project_path(self._window)
         self._on_closed = on_closed
         self._is_closing = False
+        # bumped whenever sessions start, stop or end, or configs change, so view bindings are rebuilt.
+        self._generation = 0
+        self._view_sessions = MeasuredCache()
 
     def get_session(self, config_name: str) -> 'Optional[Session]':
         return self._sessions.get(config_name)
 
+    def debounce_windows(self) -> 'Dict[int, float]':
+        return self._documents.debounce_windows()
+
+    def session_for_view(self, view: ViewLike, point: 'Optional[int]'=None) -> 'Optional[Session]':
+        """
+        The ready session for the scope at point, or at the first selection, if the view's
+        document was opened in it.
+
+        Without a point, as when commands and menus check whether they apply, the view is
+        bound to a session by its id and syntax until sessions or configs change, so the
+        lookup does not resolve scopes again.
+        """
+        if point is not None:
+            session = self._find_view_session(view, point)
+        else:
+            key = (self._generation, view.id(), view.settings().get("syntax"))
+            session = self._view_sessions.get(key, lambda: self._find_view_session(view, None))
+        if session and self.is_document_open(view, session.config.name):
+            return session
+        return None
+
+    def is_document_open(self, view: ViewLike, config_name: str) -> bool:
+        """Whether the view's document was opened in a session; large files may never be."""
+        file_name = view.file_name()
+        return file_name is not None and self._documents.is_open(file_name, config_name)
+
+    def _find_view_session(self, view: ViewLike, point: 'Optional[int]') -> 'Optional[Session]':
+        config = self._configs.scope_config(view, point)
+        if config:
+            session = self._sessions.get(config.name)
+            if session and session.state == ClientStates.READY:
+                return session
+        return None
+
+    def view_session_stats(self) -> 'Dict[str, Any]':
+        return self._view_sessions.stats()
+
+    def _sessions_changed(self) -> None:
+        self._generation += 1
+        self._view_sessions.clear()
+
     def _is_session_ready(self, config_name: str):
         if config_name not in self._sessions:
             return False
@@ -330,6 +528,7 @@ class WindowManager(object):
 
     def update_configs(self, configs: 'List[ClientConfig]') -> None:
         self._configs.update(configs)
+        self._sessions_changed()
 
     def start_active_views(self):
         active_views = get_active_views(self._window)
@@ -372,6 +571,7 @@ class WindowManager(object):
             if session:
                 debug("window {} added session {}".format(self._window.id(), config.name))
                 self._sessions[config.name] = session
+                self._sessions_changed()
         else:
             debug('Already starting on this window:', config.name)
 
@@ -395,12 +595,21 @@ class WindowManager(object):
         if config_name in self._sessions:
             debug("unloading session", config_name)
             self._sessions[config_name].end()
+            self._sessions_changed()
 
     def _end_old_sessions(self):
         if get_project_path(self._window) != self._project_path:
             debug('project path changed, ending existing sessions')
             self.end_sessions()
 
+    def _handle_diagnostics(self, config_name: str, params: 'Dict[str, Any]') -> None:
+        # runs on a dispatcher worker: both handlers only convert the diagnostics here, and
+        # leave the shared state to the main and async threads.
+        uri = params.get("uri")
+        if uri:
+            self._documents.handle_diagnostics(config_name, uri)
+        self._diagnostics.update(self._window, config_name, params)
+
     def _apply_workspace_edit(self, params):
         edit = params.get('edit', dict())
         self._window.run_command('lsp_apply_workspace_edit', {'changes': edit.get('changes'),
@@ -422,13 +631,14 @@ class WindowManager(object):
 
         client.on_notification(
             "textDocument/publishDiagnostics",
-            lambda params: self._diagnostics.update(self._window, config.name, params))
+            lambda params: self._handle_diagnostics(config.name, params))
 
         client.on_notification(
             "window/showMessage",
             lambda params: self._sublime.message_dialog(params.get("message")))
 
         self._handlers.on_initialized(config.name, self._window, client)
+        self._sessions_changed()
 
         document_sync = session.capabilities.get("textDocumentSync")
         if document_sync:
@@ -480,6 +690,7 @@ class WindowManager(object):
     def _handle_session_ended(self, config_name):
         self._documents.remove_session(config_name)
         del self._sessions[config_name]
+        self._sessions_changed()
         for view in self._window.views():
             if view.file_name():
                 self._diagnostics.remove(view, config_name)
@@ -13,10 +13,13 @@ from .core.settings import settings, PLUGIN_NAME
 from .core.protocol import Diagnostic, DiagnosticSeverity
 from .core.events import global_events
 from .core.configurations import is_supported_syntax
-from .core.diagnostics import DiagnosticsUpdate, get_window_diagnostics, get_line_diagnostics
+from .core.diagnostics import (DiagnosticsUpdate, get_window_diagnostics, get_line_diagnostics, get_window_counts,
+                               get_dropped_count)
 from .core.workspace import get_project_path
 from .core.panels import create_output_panel
-from .core.views import range_to_region
+from .core.sections import Sections
+from .core.cache import MeasuredCache
+from .core.views import ranges_to_regions
 from .core.logging import debug
 
 
@@ -95,13 +98,16 @@ def on_phantom_navigate(view: sublime.View, href: str, point: int):
     view.run_command("lsp_code_actions")
 
 
-def create_phantom(view: sublime.View, diagnostic: Diagnostic) -> sublime.Phantom:
-    region = range_to_region(diagnostic.range, view)
+# Phantom HTML by message, as the same messages are drawn again on every update.
+phantom_html = MeasuredCache()
+
+
+def create_phantom(view: sublime.View, diagnostic: Diagnostic, region: sublime.Region) -> sublime.Phantom:
     # TODO: hook up hide phantom (if keeping them)
-    content = create_phantom_html(diagnostic.message)
+    content = phantom_html.get(diagnostic.message, lambda: '<p>' + create_phantom_html(diagnostic.message) + '</p>')
     return sublime.Phantom(
         region,
-        '<p>' + content + '</p>',
+        content,
         sublime.LAYOUT_BELOW,
         lambda href: on_phantom_navigate(view, href, region.begin())
     )
@@ -124,17 +130,36 @@ def format_diagnostic(diagnostic: Diagnostic) -> str:
 
 phantom_sets_by_buffer = {}  # type: Dict[int, sublime.PhantomSet]
 
+# What was last drawn in each view, so unchanged diagnostics, regions and phantoms are not
+# drawn again. Each state includes the view's change count, as edits move what is drawn.
+drawn_diagnostics = {}  # type: Dict[int, Tuple]
+drawn_regions = {}  # type: Dict[int, Dict[str, Optional[Tuple]]]
+drawn_phantoms = {}  # type: Dict[int, Optional[Tuple]]
+
+
+def forget_drawn_diagnostics(view: sublime.View) -> None:
+    drawn_diagnostics.pop(view.id(), None)
+    drawn_regions.pop(view.id(), None)
+    drawn_phantoms.pop(view.buffer_id(), None)
 
-def update_diagnostics_phantoms(view: sublime.View, diagnostics: 'List[Diagnostic]'):
+
+def update_diagnostics_phantoms(view: sublime.View, diagnostics: 'List[Diagnostic]',
+                                regions: 'List[sublime.Region]'):
     global phantom_sets_by_buffer
 
     buffer_id = view.buffer_id()
     if not settings.show_diagnostics_phantoms or view.is_dirty():
-        phantoms = None
+        state = None
     else:
+        state = (view.change_count(), tuple((region.a, region.b, diagnostic.message)
+                                            for diagnostic, region in zip(diagnostics, regions)))
+    if buffer_id in drawn_phantoms and drawn_phantoms[buffer_id] == state:
+        return
+    drawn_phantoms[buffer_id] = state
+
+    if state:
         phantoms = list(
-            create_phantom(view, diagnostic) for diagnostic in diagnostics)
-    if phantoms:
+            create_phantom(view, diagnostic, region) for diagnostic, region in zip(diagnostics, regions))
         phantom_set = phantom_sets_by_buffer.get(buffer_id)
         if not phantom_set:
             phantom_set = sublime.PhantomSet(view, "lsp_diagnostics")
@@ -144,51 +169,53 @@ def update_diagnostics_phantoms(view: sublime.View, diagnostics: 'List[Diagnosti
         phantom_sets_by_buffer.pop(buffer_id, None)
 
 
-def update_diagnostics_regions(view: sublime.View, diagnostics: 'List[Diagnostic]', severity: int):
+def update_diagnostics_regions(view: sublime.View, diagnostics: 'List[Diagnostic]',
+                               regions: 'List[sublime.Region]', severity: int):
     region_name = "lsp_" + format_severity(severity)
     if settings.show_diagnostics_phantoms and not view.is_dirty():
-        regions = None
+        severity_regions = []  # type: List[sublime.Region]
     else:
-        regions = list(range_to_region(diagnostic.range, view) for diagnostic in diagnostics
-                       if diagnostic.severity == severity)
-    if regions:
+        severity_regions = [region for diagnostic, region in zip(diagnostics, regions)
+                            if diagnostic.severity == severity]
+    flags = UNDERLINE_FLAGS if settings.diagnostics_highlight_style == "underline" else BOX_FLAGS
+    state = (view.change_count(), tuple((region.a, region.b) for region in severity_regions),
+             settings.diagnostics_gutter_marker, flags) if severity_regions else None
+    view_regions = drawn_regions.setdefault(view.id(), {})
+    if region_name in view_regions and view_regions[region_name] == state:
+        return
+    view_regions[region_name] = state
+
+    if severity_regions:
         scope_name = diagnostic_severity_scopes[severity]
         view.add_regions(
-            region_name, regions, scope_name, settings.diagnostics_gutter_marker,
-            UNDERLINE_FLAGS if settings.diagnostics_highlight_style == "underline" else BOX_FLAGS)
+            region_name, severity_regions, scope_name, settings.diagnostics_gutter_marker, flags)
     else:
         view.erase_regions(region_name)
 
 
 def update_diagnostics_in_view(view: sublime.View, diagnostics: 'List[Diagnostic]'):
-    if view and view.is_valid():
-        update_diagnostics_phantoms(view, diagnostics)
+    if view and view.is_valid() and not view.settings().get("lsp_large_file"):
+        state = (view.change_count(), view.is_dirty(), settings.show_diagnostics_phantoms,
+                 settings.show_diagnostics_severity_level, settings.diagnostics_highlight_style,
+                 settings.diagnostics_gutter_marker,
+                 tuple((d.range.start.row, d.range.start.col, d.range.end.row, d.range.end.col, d.severity, d.message)
+                       for d in diagnostics))
+        if drawn_diagnostics.get(view.id()) == state:
+            return
+        drawn_diagnostics[view.id()] = state
+
+        regions = ranges_to_regions((diagnostic.range for diagnostic in diagnostics), view)
+        update_diagnostics_phantoms(view, diagnostics, regions)
         for severity in range(
                 DiagnosticSeverity.Error,
                 DiagnosticSeverity.Error + settings.show_diagnostics_severity_level):
-            update_diagnostics_regions(view, diagnostics, severity)
+            update_diagnostics_regions(view, diagnostics, regions, severity)
 
 
 def update_diagnostics_in_status_bar(view: sublime.View):
-    errors = 0
-    warnings = 0
-
     window = view.window()
     if window:
-        diagnostics_by_file = get_window_diagnostics(window)
-
-        if diagnostics_by_file:
-            for file_path, source_diagnostics in diagnostics_by_file.items():
-
-                if source_diagnostics:
-                    for origin, diagnostics in source_diagnostics.items():
-                        for diagnostic in diagnostics:
-
-                            if diagnostic.severity == DiagnosticSeverity.Error:
-                                errors += 1
-                            if diagnostic.severity == DiagnosticSeverity.Warning:
-                                warnings += 1
-
+        errors, warnings = get_window_counts(window)
         if errors > 0 or warnings > 0:
             count = 'E: {} W: {}'.format(errors, warnings)
         else:
@@ -204,6 +231,13 @@ def update_count_in_status_bar(view):
 global_events.subscribe("document.diagnostics",
                         lambda update: handle_diagnostics(update))
 global_events.subscribe("view.on_activated_async", update_count_in_status_bar)
+global_events.subscribe("view.on_close", forget_drawn_diagnostics)
+global_events.subscribe("document.diagnostics_flushed",
+                        lambda windows: handle_diagnostics_flushed(windows))
+
+
+# Files with changed diagnostics per window, whose panel sections are replaced once the flush is done.
+changed_panel_files = {}  # type: Dict[int, List[str]]
 
 
 def handle_diagnostics(update: DiagnosticsUpdate):
@@ -211,9 +245,16 @@ def handle_diagnostics(update: DiagnosticsUpdate):
     view = window.find_open_file(update.file_path)
     if view:
         update_diagnostics_in_view(view, update.diagnostics)
-        if settings.show_diagnostics_count_in_view_status:
-            update_diagnostics_in_status_bar(view)
-    update_diagnostics_panel(window)
+    changed_panel_files.setdefault(window.id(), []).append(update.file_path)
+
+
+def handle_diagnostics_flushed(windows: 'List[sublime.Window]'):
+    # the counts and the panel are for the window, so one update of each covers a whole batch.
+    for window in windows:
+        update_diagnostics_panel(window, changed_panel_files.pop(window.id(), None))
+        view = window.active_view()
+        if view:
+            update_count_in_status_bar(view)
 
 
 class DiagnosticsCursorListener(sublime_plugin.ViewEventListener):
@@ -274,11 +315,42 @@ def ensure_diagnostics_panel(window: sublime.Window):
     return window.find_output_panel("diagnostics") or create_diagnostics_panel(window)
 
 
-def update_diagnostics_panel(window: sublime.Window):
+class PanelSections(Sections):
+    """The diagnostics panel's text, as one section per file, for the project path it was made with."""
+
+    def __init__(self, base_dir: 'Optional[str]') -> None:
+        super().__init__()
+        self.base_dir = base_dir
+
+
+# Per window, so a publishDiagnostics only reformats and replaces the section of its file.
+panel_sections = {}  # type: Dict[int, PanelSections]
+
+
+def format_file_section(file_path: str, base_dir: 'Optional[str]',
+                        source_diagnostics: 'Optional[Dict[str, List[Diagnostic]]]', dropped: int = 0) -> str:
+    if not source_diagnostics:
+        return ""
+    try:
+        relative_file_path = os.path.relpath(file_path, base_dir) if base_dir else file_path
+    except ValueError:
+        relative_file_path = file_path
+    content = format_diagnostics(relative_file_path, source_diagnostics)
+    if dropped:
+        content += "    ({} more not kept, over the diagnostics limits)\n".format(dropped)
+    return content + "\n"
+
+
+def update_diagnostics_panel(window: sublime.Window, file_paths: 'Optional[List[str]]' = None):
+    """
+    Updates the diagnostics panel for files' new diagnostics, in one edit, or for all files when
+    no files are given.
+    """
     assert window, "missing window!"
 
     if not window.is_valid():
         debug('ignoring update to closed window')
+        panel_sections.pop(window.id(), None)
         return
 
     base_dir = get_project_path(window)
@@ -294,23 +366,28 @@ def update_diagnostics_panel(window: sublime.Window):
             assert panel, "must have a panel now!"
             panel.settings().set("result_base_dir", base_dir)
 
-            to_render = []
-            for file_path, source_diagnostics in diagnostics_by_file.items():
-                try:
-                    relative_file_path = os.path.relpath(file_path, base_dir) if base_dir else file_path
-                except ValueError:
-                    relative_file_path = file_path
-                if source_diagnostics:
-                    to_render.append(format_diagnostics(relative_file_path, source_diagnostics))
-
-            panel.set_read_only(False)
-            panel.run_command("lsp_update_panel", {"characters": "\n".join(to_render)})
-            panel.set_read_only(True)
+            sections = panel_sections.get(window.id())
+            if file_paths is None or sections is None or sections.base_dir != base_dir or \
+                    sections.size != panel.size():
+                render_diagnostics_panel(window, panel, base_dir, diagnostics_by_file)
+            else:
+                replacements = []
+                for file_path in file_paths:
+                    replacement = sections.set(
+                        file_path, format_file_section(file_path, base_dir, diagnostics_by_file.get(file_path),
+                                                       get_dropped_count(window, file_path)))
+                    if replacement:
+                        replacements.append(replacement)
+                if replacements:
+                    panel.set_read_only(False)
+                    panel.run_command("lsp_replace_panel_regions", {"replacements": replacements})
+                    panel.set_read_only(True)
 
             if settings.auto_show_diagnostics_panel and not active_panel:
                 window.run_command("show_panel",
                                    {"panel": "output.diagnostics"})
         else:
+            panel_sections.pop(window.id(), None)
             panel = window.find_output_panel("diagnostics")
             if panel:
                 panel.run_command("lsp_clear_panel")
@@ -319,9 +396,22 @@ def update_diagnostics_panel(window: sublime.Window):
                                        {"panel": "output.diagnostics"})
 
 
+def render_diagnostics_panel(window: sublime.Window, panel: sublime.View, base_dir: 'Optional[str]',
+                             diagnostics_by_file: 'Dict[str, Dict[str, List[Diagnostic]]]') -> None:
+    sections = PanelSections(base_dir)
+    for file_path, source_diagnostics in list(diagnostics_by_file.items()):
+        sections.set(file_path, format_file_section(file_path, base_dir, source_diagnostics,
+                                                    get_dropped_count(window, file_path)))
+    panel_sections[window.id()] = sections
+
+    panel.set_read_only(False)
+    panel.run_command("lsp_update_panel", {"characters": sections.text()})
+    panel.set_read_only(True)
+
+
 def format_diagnostics(file_path, origin_diagnostics):
     content = " ◌ {}:\n".format(file_path)
-    for origin, diagnostics in origin_diagnostics.items():
+    for origin, diagnostics in list(origin_diagnostics.items()):
         for diagnostic in diagnostics:
             item = format_diagnostic(diagnostic)
             content += item + "\n"
@@ -6,7 +6,7 @@ from .core.protocol import Request, Range, DocumentHighlightKind
 from .core.registry import session_for_view, client_for_view
 from .core.documents import get_document_position
 from .core.settings import settings
-from .core.views import range_to_region
+from .core.views import ranges_to_regions
 
 try:
     from typing import List, Dict, Optional
@@ -51,6 +51,8 @@ class DocumentHighlightListener(sublime_plugin.ViewEventListener):
         self._stored_point = -1
 
     def on_selection_modified_async(self) -> None:
+        if self.view.settings().get("lsp_large_file"):
+            return
         if not self._initialized:
             self._initialize()
         if self._enabled:
@@ -92,7 +94,7 @@ class DocumentHighlightListener(sublime_plugin.ViewEventListener):
                 params = get_document_position(self.view, point)
                 if params:
                     request = Request.documentHighlight(params)
-                    client.send_request(request, self._handle_response)
+                    client.send_request(request, self._handle_response, supersede_key=self.view.id())
 
     def _handle_response(self, response: 'Optional[List]') -> None:
         if not response:
@@ -100,8 +102,8 @@ class DocumentHighlightListener(sublime_plugin.ViewEventListener):
         kind2regions = {}  # type: Dict[str, List[sublime.Region]]
         for kind in range(0, 4):
             kind2regions[_kind2name[kind]] = []
-        for highlight in response:
-            r = range_to_region(Range.from_lsp(highlight["range"]), self.view)
+        regions = ranges_to_regions((Range.from_lsp(highlight["range"]) for highlight in response), self.view)
+        for highlight, r in zip(response, regions):
             kind = highlight.get("kind", DocumentHighlightKind.Unknown)
             kind2regions[_kind2name[kind]].append(r)
         if settings.document_highlight_style == "fill":
@@ -64,7 +64,8 @@ class LspHoverCommand(LspTextCommand):
                     if session.client:
                         session.client.send_request(
                             Request.hover(document_position),
-                            lambda response: self.handle_response(response, point))
+                            lambda response: self.handle_response(response, point),
+                            supersede_key=self.view.id())
 
     def handle_response(self, response: 'Optional[Any]', point) -> None:
         all_content = ""